@@ -3,6 +3,10 @@ import sys
 
 RED = [0, 65535, 65535, 3500]  # Fixes RED from appearing BLACK
 HEARTBEAT_RATE_MS = 3000  # 3 seconds
-FRAME_PERIOD_MS = 1500  # 1.5 seconds
+# Poll a LAN device only after this long without hearing its state
+STALE_STATE_MS = 30000
+# How often the UI shows the state changes the bulb interface heard. An idle tick is one empty
+# queue check, so this can be short enough that a change looks instant.
+FRAME_PERIOD_MS = 100
 LOGFILE = "lifx-control-panel.log"
 APPLICATION_PATH = os.path.dirname(sys.executable)
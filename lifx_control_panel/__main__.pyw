@@ -11,6 +11,7 @@ import ast
 import concurrent.futures
 import logging
 import os
+import queue
 import socket as _socket
 import sys
 import threading
@@ -21,16 +22,16 @@ from collections import OrderedDict, defaultdict
 from logging.handlers import RotatingFileHandler
 from PIL import Image
 from tkinter import font as tkfont, messagebox, ttk
-from typing import List, Dict, Union, Optional
+from typing import List, Dict, Set, Union, Optional
 
 import pystray
 import lifxlan
 if os.name == 'nt':
     import pystray._win32
 
-from lifx_control_panel import HEARTBEAT_RATE_MS, FRAME_PERIOD_MS, LOGFILE
+from lifx_control_panel import HEARTBEAT_RATE_MS, FRAME_PERIOD_MS, LOGFILE, STALE_STATE_MS
 from lifx_control_panel._constants import BUILD_DATE, AUTHOR, DEBUGGING, VERSION
-from lifx_control_panel.frames import LightFrame, GroupFrame
+from lifx_control_panel.frames import LightFrame, GroupFrame, PendingFrame
 from lifx_control_panel.ui import settings
 from lifx_control_panel.ui.icon_list import BulbIconList
 from lifx_control_panel.ui.settings import config, KEYBIND_ACTIONS
@@ -42,6 +43,8 @@ from lifx_control_panel.utilities.utils import (resource_path,
                                                 Color,
                                                 str2tuple)
 from lifx_control_panel.utilities.multizone import set_zone_colors
+from lifx_control_panel.utilities.registry import DeviceRecord, DeviceRegistry, is_multizone_product, probe_devices
+from lifx_control_panel.utilities.transport import is_lan_device, shared_transport
 
 # determine if application is a script file or frozen exe
 APPLICATION_PATH = os.path.dirname(__file__)
@@ -51,6 +54,7 @@ LOGFILE = os.path.join(APPLICATION_PATH, LOGFILE)
 SPLASH_FILE = resource_path('res/splash_vector.png')
 
 SCAN_ATTEMPTS = 3  # retries per bulb for transient UDP timeouts during discovery
+DISCOVERY_POLL_MS = 250  # how often the Tk thread checks for background discovery results
 
 
 class _ResetTolerantSocket(_socket.socket):
@@ -113,7 +117,7 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         # Setup menu
         self.menubar = tkinter.Menu(master)
         file_menu = tkinter.Menu(self.menubar, tearoff=0)
-        file_menu.add_command(label="Rescan", command=self.scan_for_lights)
+        file_menu.add_command(label="Rescan", command=self.rescan)
         file_menu.add_command(label="Settings", command=self.show_settings)
         file_menu.add_command(label="Save Current State", command=self.save_state)
         file_menu.add_separator()
@@ -125,17 +129,29 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         # Initialize LIFX objects
         self.tk_light_name = tkinter.StringVar(self)
         self.device_map: Dict[str, Union[lifxlan.Device, lifxlan.Group]] = OrderedDict()  # LifxLight objects
-        self.frame_map: Dict[str, LightFrame] = {}  # corresponding LightFrame GUI
+        self.frame_map: Dict[str, LightFrame] = {}  # corresponding LightFrame GUI, once built
+        self.pending_frames: Dict[str, PendingFrame] = {}  # the ones not built yet; see get_frame
+        self._stale_icons: Set[str] = set()  # changed while the window was minimized
         self.current_lightframe: Optional[LightFrame] = None  # currently selected and visible LightFrame
         self.current_light: Optional[lifxlan.Light]
         self.bulb_icons = BulbIconList(self)
         self.group_icons = BulbIconList(self, is_group=True)
 
-        self.scan_for_lights()
+        # Remembered devices come up in well under a second; a full scan is the fallback
+        self.registry = DeviceRegistry()
+        self._discovered: queue.Queue = queue.Queue()
+        self._discovery_thread: Optional[threading.Thread] = None
+        known = self.registry.load()
+        # Zone counts of strips, kept across sessions: frames are built lazily, and only a
+        # built frame (or get_color_zones) counts them
+        self._recorded_zones = {mac: record.zones for mac, record in known.items()}
+        if not (known and self._start_from_registry(known)):
+            self.scan_for_lights()
 
+        # Keep light-name in sync with drop-down selection
+        self.tk_light_name.trace_add('write', self.bulb_changed)
         if any(self.device_map):
-            self.tk_light_name.set(next(iter(self.device_map.keys())))
-            self.current_light = self.device_map[self.tk_light_name.get()]
+            self._show_first_device()  # the only frame built at startup
             if config.getboolean("AppSettings", "restore_state_on_startup"):
                 self.restore_state()
         else:
@@ -144,8 +160,6 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
 
         self.bulb_icons.grid(row=1, column=1, sticky='w')
         self.bulb_icons.canvas.bind('<Button-1>', self.on_bulb_canvas_click)
-        # Keep light-name in sync with drop-down selection
-        self.tk_light_name.trace_add('write', self.bulb_changed)
 
         self.group_icons.grid(row=2, column=1, sticky='w')
         self.group_icons.canvas.bind('<Button-1>', self.on_bulb_canvas_click)
@@ -196,8 +210,8 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         # Stop splashscreen and start main function
         self.splashscreen.__exit__(None, None, None)
 
-        # Start icon callback
-        self.after(FRAME_PERIOD_MS, self.update_icons)
+        # Start the UI's one timer
+        self.after(FRAME_PERIOD_MS, self.dispatch_changes)
 
         # Minimize if in config
         if config.getboolean("AppSettings", "start_minimized"):
@@ -241,40 +255,191 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
 
     def scan_for_lights(self):
         """ Communicating with the interface Thread, attempt to find any new devices """
-        # Stop and restart the bulb interface
-        stop_event: threading.Event = self.bulb_interface.stopped
-        if not stop_event.is_set():
-            stop_event.set()
         device_list: List[Union[lifxlan.Group, lifxlan.Light, lifxlan.MultiZoneLight]] = self.lifx.get_devices()
-        for index, device in enumerate(device_list):
-            # lifxlan falls back to a plain Light if GetVersion times out during discovery;
-            # rebuild misclassified multizone devices so get_color_zones exists
-            for attempt in range(1, SCAN_ATTEMPTS + 1):
-                try:
-                    if device.supports_multizone() and not isinstance(device, lifxlan.MultiZoneLight):
-                        device_list[index] = lifxlan.MultiZoneLight(
-                            device.mac_addr, device.ip_addr, device.service,
-                            device.port, device.source_id, device.verbose)
-                    break
-                except lifxlan.WorkflowException as exc:
-                    self.logger.warning("Error checking device type for %s (attempt %d/%d): %s",
-                                        device.mac_addr, attempt, SCAN_ATTEMPTS, exc)
-        # Every device's state in parallel, before anything touches it serially below
+        device_list, group_map = self._prefetch_devices(device_list)
+        self._restart_interface(device_list)
+        self._add_devices(self.bulb_interface.device_list, group_map)
+        self._save_registry()
+        if hasattr(self, 'tray_icon'):  # first scan runs before the tray icon exists
+            self.tray_icon.update_menu()
+
+    def _start_from_registry(self, records: Dict[str, DeviceRecord]) -> bool:
+        """ Build frames for the remembered devices that answer a unicast probe, and leave
+        broadcast discovery to find new ones in the background (see rescan). False if none answered, so
+        the caller falls back to a full scan. """
+        devices = DeviceRegistry.probe(shared_transport(), records.values())
+        if not devices:
+            return False
+        self.logger.info("%d of %d remembered devices answered", len(devices), len(records))
+        group_map: Dict[str, List[lifxlan.Device]] = defaultdict(list)
+        for device in devices:
+            if records[device.mac_addr].group is not None:
+                group_map[records[device.mac_addr].group].append(device)
+        self._restart_interface(devices)
+        self._add_devices(self.bulb_interface.device_list, group_map)
+        self._start_discovery()
+        return True
+
+    def rescan(self):
+        """ File->Rescan. Discovery runs in the background and only the devices that came or
+        went are touched; the heartbeat and every other frame carry on meanwhile. """
+        self._start_discovery()
+
+    def _start_discovery(self):
+        if self._discovery_thread is not None and self._discovery_thread.is_alive():
+            return  # already looking; its results will land
+        self._discovery_thread = threading.Thread(target=self._discover_devices, name="Discovery", daemon=True)
+        self._discovery_thread.start()
+        self.after(DISCOVERY_POLL_MS, self._poll_discovery)
+
+    def _discover_devices(self):
+        """ Background thread: results go to _poll_discovery on the Tk thread. Something always
+        goes on the queue, even when discovery fails, or _poll_discovery would wait forever. """
+        try:
+            result = self._find_device_changes()
+        except (lifxlan.WorkflowException, OSError) as exc:
+            self.logger.warning("Background discovery failed: %s", exc)
+            result = ([], {}, [])
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Background discovery failed")
+            result = ([], {}, [])
+        self._discovered.put(result)
+
+    def _find_device_changes(self):
+        """ Broadcast discovery, diffed by MAC against the devices we have. New ones are
+        classified and prefetched here. Returns (new devices, their group map, gone devices). """
+        device_list = self.lifx.get_devices()
+        found = {device.mac_addr for device in device_list}
+        known = list(self.bulb_interface.device_list)
+        known_macs = {device.mac_addr for device in known}
+        new_devices = [device for device in device_list if device.mac_addr not in known_macs]
+        # Broadcast replies get lost like any others, so a device discovery missed is only
+        # dropped if it also ignores a direct probe
+        missing = [device for device in known if device.mac_addr not in found and is_lan_device(device)]
+        answered = [device for device, _ in probe_devices(shared_transport(), missing)]
+        gone = [device for device in missing if device not in answered]
+        new_devices, group_map = self._prefetch_devices(new_devices)
+        return new_devices, group_map, gone
+
+    def _poll_discovery(self):
+        """ Tk only from the Tk thread: pick up _discover_devices' results when they land. """
+        try:
+            new_devices, group_map, gone = self._discovered.get_nowait()
+        except queue.Empty:
+            self.after(DISCOVERY_POLL_MS, self._poll_discovery)
+            return
+        if gone:
+            self._remove_devices(gone)
+        if new_devices:
+            was_empty = not self.device_map
+            self.bulb_interface.set_device_list(new_devices)
+            added = [device for device in new_devices if device in self.bulb_interface.device_list]
+            self._add_devices(added, group_map)
+            self.logger.info("Discovery added %d devices", len(added))
+            if was_empty and self.device_map:
+                self._show_first_device()
+        self._save_registry()  # refreshes addresses and groups even when nothing changed
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.update_menu()
+
+    def _remove_devices(self, devices):
+        """ Tear down everything built for devices that have left the LAN: frame, icon,
+        interface state, and group membership (a group left empty goes too). """
+        for device in devices:
+            label = device.label
+            self.bulb_interface.remove_device(device)
+            self._forget_frame(label)
+            self.device_map.pop(label, None)
+            if label in self.bulb_icons.bulb_dict:
+                self.bulb_icons.remove_bulb_icon(label)
+            for group_label, group in list(self.device_map.items()):
+                if not isinstance(group, lifxlan.Group) or device not in group.get_device_list():
+                    continue
+                group.remove_device(device)
+                if not group.get_device_list():
+                    self._forget_frame(group_label)
+                    del self.device_map[group_label]
+                    self.group_icons.remove_bulb_icon(group_label)
+            self.logger.info("Device gone: %s", label)
+        if self.device_map and self.tk_light_name.get() not in self.device_map:
+            self._show_first_device()  # the frame on screen was one of them
+
+    def _forget_frame(self, label):
+        frame = self.frame_map.pop(label, None)
+        if frame is not None:
+            frame.stop_threads()
+            frame.destroy()
+            if frame is self.current_lightframe:
+                self.current_lightframe = None
+        self.pending_frames.pop(label, None)
+
+    def _show_first_device(self):
+        label = next(iter(self.device_map))
+        self.tk_light_name.set(label)  # bulb_changed brings its frame to front
+        icons = self.group_icons if isinstance(self.device_map[label], lifxlan.Group) else self.bulb_icons
+        icons.set_selected_bulb(label)
+
+    def _classify(self, device):
+        """ The device as the class its product really is. lifxlan falls back to a plain Light
+        if GetVersion times out during discovery; rebuild misclassified multizone devices so
+        get_color_zones exists. One GetVersion at most, and none if discovery cached the
+        product. Test dummies aren't lifxlan Lights and pass through untouched. """
+        if not isinstance(device, lifxlan.Light) or isinstance(device, lifxlan.MultiZoneLight):
+            return device
+        for attempt in range(1, SCAN_ATTEMPTS + 1):
+            try:
+                if device.product is None:
+                    device.vendor, device.product, device.version = device.get_version_tuple()
+                break
+            except lifxlan.WorkflowException as exc:
+                self.logger.warning("Error checking device type for %s (attempt %d/%d): %s",
+                                    device.mac_addr, attempt, SCAN_ATTEMPTS, exc)
+        else:
+            return device
+        if not is_multizone_product(device.product):
+            return device
+        rebuilt = lifxlan.MultiZoneLight(device.mac_addr, device.ip_addr, device.service,
+                                         device.port, device.source_id, device.verbose)
+        rebuilt.vendor, rebuilt.product, rebuilt.version = device.vendor, device.product, device.version
+        return rebuilt
+
+    def _classify_and_prefetch(self, device):
+        device = self._classify(device)
+        return device, self._prefetch_state(device)
+
+    def _prefetch_devices(self, device_list):
+        """ Classify every device and warm its state, all devices in parallel, before anything
+        touches them serially; latency is the slowest device's, not the sum. Returns the
+        (possibly rebuilt) devices, and them by group label. """
+        devices: List[lifxlan.Device] = []
         group_map: Dict[str, List[lifxlan.Device]] = defaultdict(list)
         if device_list:
             with concurrent.futures.ThreadPoolExecutor(max_workers=len(device_list)) as pool:
-                for device, group_label in zip(device_list, pool.map(self._prefetch_state, device_list)):
+                for device, group_label in pool.map(self._classify_and_prefetch, device_list):
+                    devices.append(device)
                     if group_label is not None:
                         group_map[group_label].append(device)
+        return devices, group_map
 
-        self.bulb_interface = AsyncBulbInterface(stop_event, HEARTBEAT_RATE_MS)
+    def _restart_interface(self, device_list):
+        """ Stop the bulb interface and start a fresh one polling device_list. """
+        stop_event: threading.Event = self.bulb_interface.stopped
+        if not stop_event.is_set():
+            stop_event.set()
+        self.bulb_interface = AsyncBulbInterface(
+            stop_event, HEARTBEAT_RATE_MS,
+            stale_ms=config.getint("AppSettings", "stale_state_ms", fallback=STALE_STATE_MS))
         self.bulb_interface.set_device_list(device_list)
+        self.bulb_interface.set_focus(self.tk_light_name.get())  # survive a rescan
         self.bulb_interface.daemon = True
         stop_event.clear()
         self.bulb_interface.start()
 
+    def _add_devices(self, device_list, group_map: Dict[str, List[lifxlan.Device]]):
+        """ Add icons for devices the bulb interface has accepted, and for their groups.
+        Their frames are built when first selected; see get_frame. """
         light: lifxlan.Device
-        for light in self.bulb_interface.device_list:
+        for light in device_list:
             # retry transient UDP timeouts (WorkflowException) instead of skipping the bulb
             for attempt in range(1, SCAN_ATTEMPTS + 1):
                 try:
@@ -282,25 +447,13 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
                     # getters would each cost another round-trip
                     product: str = lifxlan.product_map[light.product or light.get_product()]
                     label: str = light.label or light.get_label()
-                    # Build the frame before registering the device/icon: a WorkflowException
-                    # mid-build otherwise leaves a clickable entry with no frame,
-                    # which KeyErrors in bulb_changed
-                    new_frame = None
-                    if label not in self.frame_map:
+                    if label not in self.frame_map and label not in self.pending_frames:
                         # LightFrame._get_light_info already handles multizone devices
-                        new_frame = LightFrame(self, light)
+                        self.pending_frames[label] = PendingFrame(LightFrame, self, light)
                     self.device_map[label] = light
                     self.logger.info('Light found: %s: "%s"', product, label)
                     if label not in self.bulb_icons.bulb_dict:
                         self.bulb_icons.draw_bulb_icon(light, label)
-                    if new_frame is not None:
-                        self.frame_map[label] = new_frame
-                        self.current_lightframe = new_frame
-                        try:
-                            self.bulb_icons.set_selected_bulb(label)
-                        except KeyError:
-                            self.group_icons.set_selected_bulb(label)
-                        self.logger.info("Building new frame: %s", new_frame.get_label())
                     break
                 except lifxlan.WorkflowException as exc:
                     self.logger.warning("Error when communicating with LIFX device (attempt %d/%d): %s",
@@ -312,8 +465,35 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         for group_label, devices in group_map.items():
             if group_label not in self.device_map.keys():
                 self.build_group_frame(group_label, devices)
-        if hasattr(self, 'tray_icon'):  # first scan runs before the tray icon exists
-            self.tray_icon.update_menu()
+            elif isinstance(self.device_map[group_label], lifxlan.Group):
+                group = self.device_map[group_label]
+                members = {device.mac_addr for device in group.get_device_list()}
+                for device in devices:
+                    if device.mac_addr not in members:
+                        group.add_device(device)
+
+    def _save_registry(self):
+        """ Remember every LAN device we know of, so the next launch can skip
+        broadcast discovery; see utilities.registry. """
+        groups = {device.mac_addr: label
+                  for label, group in self.device_map.items() if isinstance(group, lifxlan.Group)
+                  for device in group.get_device_list()}
+        records = []
+        for label, device in self.device_map.items():
+            if isinstance(device, lifxlan.Group) or not is_lan_device(device):
+                continue
+            zones = None
+            if hasattr(device, "get_color_zones"):
+                frame = self.frame_map.get(label)
+                if hasattr(frame, "initial_zones"):
+                    self._recorded_zones[device.mac_addr] = len(frame.initial_zones)
+                elif isinstance(getattr(device, "color", None), list):  # get_color_zones ran
+                    self._recorded_zones[device.mac_addr] = len(device.color)
+                # Not counted this session: keep the last count rather than forget it
+                zones = self._recorded_zones.get(device.mac_addr)
+            records.append(DeviceRecord.from_device(device, groups.get(device.mac_addr), zones))
+        if records:
+            self.registry.save(records)
 
     def build_group_frame(self, group_label, devices):
         # Built from the devices we already discovered; lifx.get_devices_by_group() would
@@ -322,14 +502,10 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         group.get_label = lambda: group_label  # pylint: disable=cell-var-from-loop
         # Giving an attribute here is a bit dirty, but whatever
         group.label = group_label
-        # Frame first: registering the group before GroupFrame succeeds strands a
-        # frameless entry in device_map (and the retry in scan_for_lights skips
-        # rebuilding it), which KeyErrors in bulb_changed
-        self.frame_map[group_label] = GroupFrame(self, group)
+        self.pending_frames[group_label] = PendingFrame(GroupFrame, self, group)
         self.device_map[group_label] = group
         self.group_icons.draw_bulb_icon(None, group_label)
         self.logger.info("Group found: %s", group_label)
-        self.logger.info("Building new frame: %s", self.frame_map[group_label].get_label())
 
     def save_state(self):
         """ Save each light's current power/color to config.ini; restore_state re-applies it on launch.
@@ -375,18 +551,42 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
             except (lifxlan.WorkflowException, ValueError, SyntaxError, IndexError) as exc:
                 self.logger.warning("Couldn't restore state for %s: %s", label, exc)
 
+    def get_frame(self, label) -> LightFrame:
+        """ label's LightFrame, built now if this is the first time it's been needed.
+        Retries transient UDP timeouts; WorkflowException if every attempt timed out. """
+        frame = self.frame_map.get(label)
+        if frame is not None:
+            return frame
+        for attempt in range(1, SCAN_ATTEMPTS + 1):
+            try:
+                frame = self.pending_frames[label].build()
+                break
+            except lifxlan.WorkflowException as exc:
+                self.logger.warning("Error building frame for %s (attempt %d/%d): %s",
+                                    label, attempt, SCAN_ATTEMPTS, exc)
+                if attempt == SCAN_ATTEMPTS:
+                    raise
+        del self.pending_frames[label]
+        self.frame_map[label] = frame
+        self.logger.info("Building new frame: %s", frame.get_label())
+        return frame
+
     def bulb_changed(self, *_, **__):
         """ Change current display frame when bulb icon is clicked. """
-        self.master.unbind('<Unmap>')  # unregister unmap so grid_remove doesn't trip it
         new_light_label = self.tk_light_name.get()
+        try:
+            new_frame = self.get_frame(new_light_label)
+        except lifxlan.WorkflowException:
+            return  # the frame on screen stays; clicking again tries again
+        self.master.unbind('<Unmap>')  # unregister unmap so grid_remove doesn't trip it
         self.current_light = self.device_map[new_light_label]
+        self.bulb_interface.set_focus(new_light_label)  # poll the light on screen fastest
         # loop below removes all other frames; not just the current one (this fixes sync bugs for some reason)
         for frame in self.frame_map.values():
             frame.grid_remove()
-        self.frame_map[new_light_label].grid()  # should bring to front
-        self.logger.info(
-            "Brought existing frame to front: %s", self.frame_map[new_light_label].get_label())
-        self.current_lightframe = self.frame_map[new_light_label]
+        new_frame.grid()  # should bring to front
+        self.logger.info("Brought existing frame to front: %s", new_frame.get_label())
+        self.current_lightframe = new_frame
         self.current_lightframe.restart()
         if self.current_lightframe.get_label() != self.tk_light_name.get():
             self.logger.error("Mismatch between LightFrame (%s) and Dropdown (%s)", self.current_lightframe.get_label(),
@@ -411,14 +611,26 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
             if self.bulb_icons.current_icon:
                 self.bulb_icons.clear_selected()
 
-    def update_icons(self):
-        """ If the window isn't minimized, redraw icons to reflect their current power/color state. """
-        if self.master.winfo_viewable():
-            for frame in self.frame_map.values():
-                if not isinstance(frame, GroupFrame) and frame.icon_update_flag:
-                    self.bulb_icons.update_icon(frame.target)
-                    frame.icon_update_flag = False
-        self.after(FRAME_PERIOD_MS, self.update_icons)
+    def dispatch_changes(self):
+        """ The UI's one timer. Hands each state change the bulb interface heard since the
+        last tick to the frame of the device it's about -- shown if it's on screen, held for
+        bulb_changed otherwise -- and redraws those devices' icons if the window isn't
+        minimized. Devices that didn't change cost nothing. """
+        for label, changed in self.bulb_interface.drain_changes().items():
+            frame = self.frame_map.get(label, self.pending_frames.get(label))
+            if frame is None:  # removed since the change was heard
+                continue
+            if frame is self.current_lightframe:
+                frame.apply_state(**changed)
+            else:
+                frame.hold_state(**changed)
+            self._stale_icons.add(label)
+        if self._stale_icons and self.master.winfo_viewable():
+            for label in self._stale_icons:
+                if label in self.device_map:
+                    self.bulb_icons.update_icon(self.device_map[label])
+            self._stale_icons.clear()
+        self.after(FRAME_PERIOD_MS, self.dispatch_changes)
 
     def save_keybind(self, light, keypress, color):
         """ Builds a new anonymous function running the keybind action (a color, or a
@@ -451,7 +663,8 @@ class LifxFrame(ttk.Frame):  # pylint: disable=too-many-ancestors
         """ Show the settings dialog box over the master window. """
         self.key_listener.shutdown()
         settings.SettingsDisplay(self, "Settings")
-        self.current_lightframe.update_user_dropdown()
+        if self.current_lightframe is not None:  # none built yet, or its device left
+            self.current_lightframe.update_user_dropdown()
         self.audio_interface.init_audio(config)
         for frame in self.frame_map.values():
             frame.music_button.config(state="normal" if self.audio_interface.initialized else "disabled")
@@ -6,6 +6,7 @@ from typing import Union, List, Tuple, Dict, Mapping
 
 import lifxlan
 import win32api
+from lifxlan.msgtypes import LightSetColor, LightSetPower
 
 from lifxlan import (
     ORANGE,
@@ -21,7 +22,7 @@ from lifxlan import (
     GOLD,
 )
 
-from lifx_control_panel import RED, FRAME_PERIOD_MS
+from lifx_control_panel import RED
 from lifx_control_panel.ui.colorscale import ColorScale
 from lifx_control_panel.ui.settings import config
 from lifx_control_panel.utilities import color_thread
@@ -40,7 +41,9 @@ from lifx_control_panel.utilities.utils import (
     str2tuple,
     get_display_rects,
 )
+from lifx_control_panel.utilities.colors import hsbk_to_rgb_array, rgb_to_hsbk
 from lifx_control_panel.utilities.multizone import set_zone_colors
+from lifx_control_panel.utilities.transport import is_lan_device, shared_transport
 
 MAX_KELVIN_DEFAULT = 9000
 
@@ -84,7 +87,21 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
     music_button: ttk.Button
     preset_colors_lf: ttk.LabelFrame
     color_var: tkinter.StringVar
-    default_colors: Mapping[str, Color]
+    # The same on every frame, so settings can read them without building one
+    default_colors: Mapping[str, Color] = {
+        "RED": RED,
+        "ORANGE": ORANGE,
+        "YELLOW": YELLOW,
+        "GREEN": GREEN,
+        "CYAN": CYAN,
+        "BLUE": BLUE,
+        "PURPLE": PURPLE,
+        "PINK": PINK,
+        "WHITE": WHITE,
+        "COLD_WHITE": COLD_WHITE,
+        "WARM_WHITE": WARM_WHITE,
+        "GOLD": GOLD,
+    }
     preset_dropdown: ttk.OptionMenu
     tk_user_def_color_var: tkinter.StringVar
     user_dropdown: ttk.OptionMenu
@@ -106,6 +123,9 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
     # Class-level so set_color is safe to call before/during __init__
     _color_send_job = None
     _pending_color = None
+    _held_state = None  # see hold_state
+    ambilight_btn = None  # multizone only; see _setup_zone_controls
+    runner_class = color_thread.ColorThreadRunner  # what drives the special functions
 
     def __init__(self, master, target: lifxlan.Device):
         super().__init__(
@@ -113,7 +133,6 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             padding="8 6 8 8",
             labelwidget=ttk.Label(master, text="<LABEL_ERR>", style="Title.TLabel"),
         )
-        self.icon_update_flag: bool = True
         # Initialize LightFrames
         bulb_power, init_color = self._get_light_info(target)
 
@@ -156,9 +175,6 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
 
         self._pad_children()
 
-        # Start update loop
-        self.update_status_from_bulb()
-
     def _pad_children(self, parent=None):
         """Give every gridded widget the same breathing room, instead of padding each
         of the ~40 grid() calls individually."""
@@ -213,10 +229,10 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
                 0,
                 (index + 1) * self.zone_width,
                 20,
-                fill=tuple2hex(hsbk_to_rgb(zone)),
+                fill=tuple2hex(tuple(rgb)),
                 outline="",
             )
-            for index, zone in enumerate(zones)
+            for index, rgb in enumerate(hsbk_to_rgb_array(zones).tolist())
         ]
         # The canvas is the source of truth while painting; commit_paint pushes it to the bulb
         self.zone_colors: List[Color] = list(zones)
@@ -227,6 +243,23 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         self.zone_canvas.bind("<B1-Motion>", self.paint_zone)
         self.zone_canvas.bind("<ButtonRelease-1>", self.commit_paint)
         self.zone_canvas.pack()
+        # Screen ambilight: each zone follows its own column of the Avg. Screen region
+        self.threads["ambilight"] = color_thread.ZoneColorThreadRunner(
+            self.target,
+            color_thread.zone_screen_colors,
+            self,
+            func_bounds=self.get_monitor_bounds,
+            zones=len(zones),
+        )
+
+        def start_ambilight():
+            self.ambilight_btn.config(style="Running.TButton")
+            self.threads["ambilight"].start()
+
+        self.ambilight_btn = ttk.Button(
+            zones_lf, text="Screen Ambilight", command=start_ambilight
+        )
+        self.ambilight_btn.pack(fill="x")
         zones_lf.grid(row=8, columnspan=4)
 
     def paint_zone(self, event):
@@ -322,7 +355,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
 
     def _setup_special_functions(self):
         # Color cycle
-        self.threads["cycle"] = color_thread.ColorThreadRunner(
+        self.threads["cycle"] = self.runner_class(
             self.target, color_thread.ColorCycle(), self
         )
 
@@ -337,7 +370,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         )
         self.color_cycle_btn.grid(row=7, column=1, sticky="ew")
         # Screen Avg.
-        self.threads["screen"] = color_thread.ColorThreadRunner(
+        self.threads["screen"] = self.runner_class(
             self.target,
             color_thread.avg_screen_color,
             self,
@@ -361,7 +394,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             command=self.get_color_from_palette,
         ).grid(row=8, column=0, sticky="ew")
         # Screen Dominant
-        self.threads["dominant"] = color_thread.ColorThreadRunner(
+        self.threads["dominant"] = self.runner_class(
             self.target,
             color_thread.dominant_screen_color,
             self,
@@ -379,7 +412,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         )
         self.dominant_screen_btn.grid(row=6, column=1, sticky="ew")
         # Audio
-        self.threads["audio"] = color_thread.ColorThreadRunner(
+        self.threads["audio"] = self.runner_class(
             self.target, self.master.audio_interface.get_music_color, self
         )
 
@@ -397,7 +430,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             ),
         )
         self.music_button.grid(row=7, column=0, sticky="ew")
-        self.threads["eyedropper"] = color_thread.ColorThreadRunner(
+        self.threads["eyedropper"] = self.runner_class(
             self.target, self.eyedropper, self, continuous=False
         )
         ttk.Button(
@@ -416,20 +449,6 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             self, text="Preset Colors", padding="3 3 12 12"
         )
         self.color_var = tkinter.StringVar(self, value="Presets")
-        self.default_colors = {
-            "RED": RED,
-            "ORANGE": ORANGE,
-            "YELLOW": YELLOW,
-            "GREEN": GREEN,
-            "CYAN": CYAN,
-            "BLUE": BLUE,
-            "PURPLE": PURPLE,
-            "PINK": PINK,
-            "WHITE": WHITE,
-            "COLD_WHITE": COLD_WHITE,
-            "WARM_WHITE": WARM_WHITE,
-            "GOLD": GOLD,
-        }
         self.preset_dropdown = ttk.OptionMenu(
             self.preset_colors_lf, self.color_var, "Presets", *self.default_colors
         )
@@ -471,8 +490,6 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             tkinter.IntVar(self, init_color.brightness, "Brightness"),
             tkinter.IntVar(self, init_color.kelvin, "Kelvin"),
         )
-        for i in self.hsbk:
-            i.trace_add("write", self.trigger_icon_update)
         self.hsbk_entry_vars = tuple(
             tkinter.StringVar(self, str(var.get())) for var in self.hsbk
         )
@@ -581,18 +598,17 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         )
 
     def restart(self):
-        """Get updated information for the bulb when clicked."""
-        self.update_status_from_bulb()
+        """Called when the frame is brought to front: show the state held while it was
+        hidden. Nothing to fetch; the dispatcher kept it."""
+        if self._held_state:
+            self.apply_state(**self._held_state)
+            self._held_state = None
         self.logger.info("Light frame Restarted.")
 
     def get_label(self):
         """Getter method for the label attribute. Often is monkey-patched."""
         return self.label
 
-    def trigger_icon_update(self, *_, **__):
-        """Just sets a flag for now. Could be more advanced in the future."""
-        self.icon_update_flag = True
-
     def get_color_values_hsbk(self):
         """Get color values entered into GUI"""
         return Color(*tuple(v.get() for v in self.hsbk))
@@ -604,15 +620,26 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             self.avg_screen_btn,
             self.dominant_screen_btn,
             self.color_cycle_btn,
+            self.ambilight_btn,
         ):
-            button.config(style="TButton")
+            if button is not None:
+                button.config(style="TButton")
         for thread in self.threads.values():
             thread.stop()
 
     def update_power(self):
         """Send new power state to bulb when UI is changed."""
         self.stop_threads()
-        self.target.set_power(self.tk_power_var.get())
+        if is_lan_device(self.target):
+            # Over the shared socket, like _send_color, so on_packet sees the ack
+            transport = shared_transport()
+            power = 65535 if self.tk_power_var.get() else 0
+            payload = {"power_level": power, "duration": 0}
+            transport.submit(
+                transport.ack(self.target, LightSetPower, payload)
+            ).result()
+        else:
+            self.target.set_power(self.tk_power_var.get())
 
     def update_color_from_ui(self, *_, **__):
         """Send new color state to bulb when UI is changed."""
@@ -638,14 +665,21 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
 
     def _send_color(self, color, rapid):
         """The one place a whole-device color actually goes out on the wire."""
+        duration = 0 if rapid else float(config["AverageColor"]["duration"]) * 1000
         try:
-            self.target.set_color(
-                color,
-                duration=(
-                    0 if rapid else float(config["AverageColor"]["duration"]) * 1000
-                ),
-                rapid=rapid,
-            )
+            if is_lan_device(self.target):
+                # Over the shared socket: a drag's rapid sends don't wait at all, and an
+                # acked send only blocks for the reply, not for opening a socket first.
+                transport = shared_transport()
+                payload = {"color": color, "duration": duration}
+                if rapid:
+                    transport.submit_and_forget(transport.set(self.target, LightSetColor, payload))
+                else:
+                    transport.submit(
+                        transport.ack(self.target, LightSetColor, payload)
+                    ).result()
+            else:
+                self.target.set_color(color, duration=duration, rapid=rapid)
         except lifxlan.WorkflowException as exc:
             if not rapid:
                 raise exc
@@ -680,8 +714,8 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         # Keep the sliders in sync with the chosen color. paint_zone reads them as its source,
         # and for multizone the heartbeat no longer syncs a device color, so presets/palette
         # would otherwise leave the sliders (and thus painting) stuck at the dim init color.
-        # Also refresh the swatches/entries here: update_status_from_bulb used to be the only
-        # thing driving them, and it no longer sees a color for multizone devices.
+        # Also refresh the swatches/entries here: apply_state is the only other thing
+        # driving them, and it never sees a color for multizone devices.
         for key, value in enumerate(color):
             if self.hsbk[key].get() != value:
                 self.hsbk[key].set(value)
@@ -750,43 +784,33 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
             initialcolor=hsbk_to_rgb(self.get_color_values_hsbk())
         )[0]
         if color:
-            # RGBtoHBSK sometimes returns >65535, so we have to truncate
-            hsbk = [min(c, 65535) for c in lifxlan.RGBtoHSBK(color, self.hsbk[3].get())]
+            hsbk = list(rgb_to_hsbk(color, self.hsbk[3].get()))
             self.set_color(hsbk)
             self.logger.info("Color set to HSBK %s from palette.", hsbk)
 
-    def update_status_from_bulb(self, run_once=False):
-        """
-        Periodically update status from the bulb to keep UI in sync.
-        run_once - Don't call `after` statement at end. Keeps a million workers from being instanced.
-        """
-        require_icon_update = False
-        power_queue = self.master.bulb_interface.power_queue
-        if (
-            self.label in power_queue
-            and not self.master.bulb_interface.power_queue[self.label].empty()
-        ):
-            power = self.master.bulb_interface.power_queue[self.label].get()
-            require_icon_update = True
+    def hold_state(self, power=None, color=None):
+        """apply_state for a frame that isn't on screen: keep only the newest power and
+        color, for restart to show in one go. Setting the sliders of a hidden frame fires
+        their traces and redraws swatches and entries nobody can see."""
+        held = self._held_state or {}
+        if power is not None:
+            held["power"] = power
+        if color is not None:
+            held["color"] = color
+        self._held_state = held
+
+    def apply_state(self, power=None, color=None):
+        """Show the power and/or color the bulb interface heard from the device; called by
+        LifxFrame.dispatch_changes, for the frame on screen, with whatever changed since its
+        last tick."""
+        if power is not None:
             self.tk_power_var.set(bool(power))  # radiobuttons follow the var
-
-        color_queue = self.master.bulb_interface.color_queue
-        if (
-            self.label in color_queue
-            and not self.master.bulb_interface.color_queue[self.label].empty()
-        ):
-            hsbk = self.master.bulb_interface.color_queue[self.label].get()
-            require_icon_update = True
+        if color is not None:
             for key, _ in enumerate(self.hsbk):
-                self.hsbk[key].set(hsbk[key])
+                self.hsbk[key].set(color[key])
                 self.update_display(key)
             self.update_label()
-            self.current_color.config(background=tuple2hex(hsbk_to_rgb(hsbk)))
-
-        if require_icon_update:
-            self.trigger_icon_update()
-        if not run_once:
-            self.after(FRAME_PERIOD_MS, self.update_status_from_bulb)
+            self.current_color.config(background=tuple2hex(hsbk_to_rgb(color)))
 
     def eyedropper(self, *_, **__):
         """Allows user to select a color pixel from the screen."""
@@ -811,7 +835,7 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
         color = screen_img.getpixel(cursor_pos)
         self.master.master.deiconify()  # Reshow window
         self.logger.info("Eyedropper color found RGB %s", color)
-        return lifxlan.RGBtoHSBK(color, temperature=self.get_color_values_hsbk().kelvin)
+        return rgb_to_hsbk(color, temperature=self.get_color_values_hsbk().kelvin)
 
     def change_preset_dropdown(self, *_, **__):
         """Change device color to selected preset option."""
@@ -849,6 +873,8 @@ class LightFrame(ttk.Labelframe):  # pylint: disable=too-many-ancestors
 
 
 class GroupFrame(LightFrame):
+    runner_class = color_thread.GroupColorThreadRunner
+
     def _get_light_info(self, target: lifxlan.Group) -> Tuple[int, Color]:
         init_color: Color = Color(*lifxlan.WARM_WHITE)
         # WorkflowException propagates up to scan_for_lights, which retries the frame build
@@ -881,5 +907,31 @@ class GroupFrame(LightFrame):
         )
         return bulb_power, init_color
 
-    def update_status_from_bulb(self, run_once=False):
-        return
+    def apply_state(self, power=None, color=None):
+        return  # the interface tracks member bulbs, never the group
+
+
+class PendingFrame:
+    """A device's LightFrame before it's built. Frames are built the first time their
+    device is selected (see LifxFrame.get_frame): a full LightFrame is hundreds of widgets
+    and five runners, and most devices in a big install are never opened in a session.
+
+    Until then, hold_state keeps the state the dispatcher hands it in the device's own
+    cached attributes -- the ones _cached and _cached_color build a frame from -- so the
+    frame starts out current."""
+
+    def __init__(self, frame_class, master, target):
+        self.frame_class = frame_class
+        self.master = master
+        self.target = target
+
+    def hold_state(self, power=None, color=None):
+        """LightFrame.hold_state, for a frame that isn't there yet."""
+        if power is not None:
+            self.target.power_level = power
+        if color is not None:
+            self.target.color = color
+
+    def build(self) -> LightFrame:
+        """The LightFrame itself. WorkflowException propagates, as from the constructor."""
+        return self.frame_class(self.master, self.target)
@@ -0,0 +1,193 @@
+"""AsyncBulbInterface keeping its caches current from what the transport overhears."""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+from lifxlan.msgtypes import LightGet, LightSetColor, LightState
+
+# async_bulb_interface uses package-relative imports, so make the repo root importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.async_bulb_interface import AsyncBulbInterface
+from lifx_control_panel.utilities.transport import LanTransport
+from test.dummy_devices import DummyBulb, LanBulbSimulator
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class EventDrivenStateTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = LanTransport().start()
+        self.addCleanup(self.transport.stop)
+        self.bulb = LanBulbSimulator(label="Desk", color=(1, 2, 3, 3500), power=0)
+        self.addCleanup(self.bulb.close)
+        self.device = self.bulb.device(self.transport.source_id)
+        self.device.color, self.device.power_level = (1, 2, 3, 3500), 0
+        self.interface = AsyncBulbInterface(
+            threading.Event(), 1000, transport=self.transport, stale_ms=60000
+        )
+        self.interface.set_device_list([self.device])
+
+    def test_broadcast_state_updates_the_caches(self):
+        state = {
+            "color": (10, 20, 30, 4000),
+            "reserved1": 0,
+            "power_level": 65535,
+            "label": "Desk",
+            "reserved2": 0,
+        }
+        self.bulb.send(LightState, state, ("127.0.0.1", self.transport.address[1]))
+        self.assertTrue(
+            wait_for(lambda: self.interface.color_cache["Desk"] == (10, 20, 30, 4000))
+        )
+        self.assertEqual(self.interface.power_cache["Desk"], 65535)
+        self.assertEqual(
+            self.interface.drain_changes(),
+            {"Desk": {"color": (10, 20, 30, 4000), "power": 65535}},
+        )
+
+    def test_changes_are_drained_once_with_the_newest_value(self):
+        self.interface._update_color("Desk", (4, 4, 4, 3500))
+        self.interface._update_color("Desk", (5, 5, 5, 3500))
+        self.interface._update_color("Desk", (5, 5, 5, 3500))  # no change, no event
+        self.assertEqual(
+            self.interface.drain_changes(), {"Desk": {"color": (5, 5, 5, 3500)}}
+        )
+        self.assertEqual(self.interface.drain_changes(), {})
+
+    def test_acknowledged_set_updates_the_cache(self):
+        payload = {"color": (7, 8, 9, 2700), "duration": 0}
+        self.transport.submit(
+            self.transport.ack(self.device, LightSetColor, payload)
+        ).result(timeout=5)
+        self.assertEqual(self.interface.color_cache["Desk"], (7, 8, 9, 2700))
+
+    def test_overheard_set_is_a_hint_to_poll_not_state(self):
+        self.interface.scheduler.pop_due()
+        self.interface.scheduler.completed("Desk", 0.01)  # next poll a minute away
+        self.interface.on_packet(
+            self.device.mac_addr,
+            LightSetColor(
+                self.device.mac_addr, 99, 0, {"color": (9, 9, 9, 3500), "duration": 0}
+            ),
+            acked=False,
+        )
+        self.assertEqual(self.interface.color_cache["Desk"], (1, 2, 3, 3500))
+        self.assertEqual(self.interface.drain_changes(), {})
+        self.assertEqual(self.interface.scheduler.pop_due(), ["Desk"])
+
+    def test_polled_device_is_not_due_again_until_stale(self):
+        self.assertEqual(self.interface.scheduler.pop_due(), ["Desk"])
+        self.transport.submit(self.interface.query_device_async(self.device)).result(
+            timeout=5
+        )
+        self.assertEqual(self.interface.scheduler.pop_due(), [])
+        self.assertEqual(
+            self.interface.scheduler.pop_due(now=time.monotonic() + 61), ["Desk"]
+        )
+        self.assertIsNotNone(self.interface.device_stats()["Desk"]["rtt_ms"])
+
+    def test_one_light_get_fills_both_caches(self):
+        self.bulb.color, self.bulb.power = (4, 5, 6, 5000), 65535
+        self.bulb.received.clear()
+        self.transport.submit(self.interface.query_device_async(self.device)).result(
+            timeout=5
+        )
+        self.assertEqual([type(m) for m in self.bulb.received], [LightGet])
+        self.assertEqual(self.interface.color_cache["Desk"], (4, 5, 6, 5000))
+        self.assertEqual(self.interface.power_cache["Desk"], 65535)
+
+    def test_silent_device_backs_off(self):
+        self.bulb.silent = True
+        self.interface.scheduler.pop_due()
+        self.transport.submit(self.interface.query_device_async(self.device)).result(
+            timeout=5
+        )
+        stats = self.interface.device_stats()["Desk"]
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["interval"], 120)
+
+    def test_unexpected_poll_error_does_not_wedge_the_device(self):
+        async def broken(*args):
+            raise OSError("network is unreachable")
+
+        self.device.get_color = lambda: 1 / 0
+        self.transport.get = broken
+        for poll in (
+            self.interface.query_device,
+            lambda device: self.transport.submit(
+                self.interface.query_device_async(device)
+            ).result(timeout=5),
+        ):
+            self.assertEqual(self.interface.scheduler.pop_due(now=1e9), ["Desk"])
+            with self.assertLogs("root", "ERROR"):
+                poll(self.device)
+            self.assertEqual(self.interface.device_stats()["Desk"]["in_flight"], 0)
+        self.assertEqual(self.interface.scheduler.pop_due(now=1e9), ["Desk"])
+
+    def test_removed_device_is_forgotten(self):
+        self.interface.remove_device(self.device)
+        self.assertEqual(self.interface.device_list, [])
+        self.assertNotIn("Desk", self.interface.color_cache)
+        self.assertNotIn("Desk", self.interface.device_stats())
+        self.assertEqual(self.interface.scheduler.pop_due(), [])
+        # a late packet from it is ignored rather than KeyErroring on the loop
+        self.interface.on_packet(
+            self.device.mac_addr,
+            LightSetColor(
+                self.device.mac_addr, 0, 0, {"color": (1, 1, 1, 3500), "duration": 0}
+            ),
+        )
+
+    def test_late_poll_of_a_removed_device_is_dropped(self):
+        self.interface.remove_device(self.device)
+        self.interface._update_power("Desk", 65535)
+        self.interface._update_color("Desk", (1, 1, 1, 3500))
+        self.assertNotIn("Desk", self.interface.power_cache)
+        self.assertEqual(self.interface.drain_changes(), {})
+
+    def test_heartbeat_survives_removal_after_pop_due(self):
+        self.interface.scheduler.pop_due = lambda: ["Desk"]
+        self.interface.remove_device(self.device)
+        self.interface.start()
+        time.sleep(0.1)
+        self.interface.stopped.set()
+        self.interface.join(timeout=2)
+        self.assertFalse(self.interface.is_alive())
+        self.assertNotIn(self.interface.on_packet, self.transport._listeners)
+
+    def test_dummy_devices_keep_the_heartbeat_cadence(self):
+        self.interface.set_device_list([DummyBulb(label="Dummy")])
+        self.assertEqual(self.interface.device_stats()["Dummy"]["interval"], 1)
+
+
+class LateDeviceTest(unittest.TestCase):
+    def test_devices_added_after_start_are_listened_to(self):
+        # The startup scan found nothing; discovery adds a bulb to the running interface
+        transport = LanTransport().start()
+        self.addCleanup(transport.stop)
+        bulb = LanBulbSimulator(label="Desk", color=(1, 2, 3, 3500), power=0)
+        self.addCleanup(bulb.close)
+        interface = AsyncBulbInterface(
+            threading.Event(), 1000, transport=transport, stale_ms=60000
+        )
+        interface.start()
+        self.addCleanup(interface.stopped.set)
+        device = bulb.device(transport.source_id)
+        device.color, device.power_level = (1, 2, 3, 3500), 0
+        interface.set_device_list([device])
+        bulb.color = (4, 5, 6, 5000)
+        transport.submit(interface.query_device_async(device)).result(timeout=5)
+        self.assertEqual(interface.color_cache["Desk"], (4, 5, 6, 5000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""Microbenchmarks for the hot color paths. Not part of the test suite; run from
+lifx_control_panel/ with:
+
+    python -m test.benchmarks
+"""
+
+import os
+import sys
+import timeit
+
+import numpy as np
+from lifxlan.utils import RGBtoHSBK
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities import colors
+from lifx_control_panel.utilities.multizone import (
+    MAX_EXTENDED_ZONES,
+    SetExtendedColorZones,
+)
+from test.packets_test import BitstringExtendedColorZones, payload
+
+
+def report(name, seconds, count):
+    print(f"{name:<44} {seconds / count * 1e6:10.2f} us")
+
+
+def bench(name, statement, count):
+    number = 5
+    seconds = min(timeit.repeat(statement, number=number, repeat=3)) / number
+    report(name, seconds, count)
+    return seconds
+
+
+def kelvin_benchmarks():
+    kelvins = list(range(colors.KELVIN_MIN, colors.KELVIN_MAX + 1, 7))
+    count = len(kelvins)
+    print(f"kelvin -> rgb, per color ({count} colors)")
+    colors.kelvin_table()  # built once, on first use; not part of a call's cost
+    old = bench(
+        "formula (old kelvin_to_rgb)",
+        lambda: list(map(colors.kelvin_formula, kelvins)),
+        count,
+    )
+    new = bench(
+        "table lookup (kelvin_to_rgb)",
+        lambda: list(map(colors.kelvin_to_rgb, kelvins)),
+        count,
+    )
+    array = np.array(kelvins)
+    batch = bench(
+        "kelvin_to_rgb_array", lambda: colors.kelvin_to_rgb_array(array), count
+    )
+    print(
+        f"  lookup {old / new:.1f}x, batch {old / batch:.1f}x faster than the formula\n"
+    )
+
+
+def hsbk_benchmarks():
+    rng = np.random.default_rng(0)
+    array = np.column_stack(
+        [rng.integers(0, 65536, (10000, 3)), rng.integers(1500, 9001, 10000)]
+    )
+    hsbk = [tuple(color) for color in array.tolist()]
+    count = len(hsbk)
+
+    print(f"hsbk -> rgb, per color ({count} colors)")
+    # The scalar conversion as it was: the kelvin formula on every call
+    table_lookup, colors.kelvin_to_rgb = colors.kelvin_to_rgb, colors.kelvin_formula
+    try:
+        old = bench(
+            "scalar, kelvin formula (old hsbk_to_rgb)",
+            lambda: list(map(colors.hsbk_to_rgb, hsbk)),
+            count,
+        )
+    finally:
+        colors.kelvin_to_rgb = table_lookup
+    new = bench(
+        "scalar, kelvin table (hsbk_to_rgb)",
+        lambda: list(map(colors.hsbk_to_rgb, hsbk)),
+        count,
+    )
+    batch = bench("hsbk_to_rgb_array", lambda: colors.hsbk_to_rgb_array(array), count)
+    print(f"  scalar {old / new:.1f}x, batch {old / batch:.1f}x faster than before\n")
+
+
+def rgb_benchmarks():
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (10000, 3))
+    rgb = [tuple(color) for color in array.tolist()]
+    count = len(rgb)
+    print(f"rgb -> hsbk, per color ({count} colors)")
+    old = bench(
+        "lifxlan RGBtoHSBK (old)", lambda: [RGBtoHSBK(color) for color in rgb], count
+    )
+    batch = bench("rgb_to_hsbk_array", lambda: colors.rgb_to_hsbk_array(array), count)
+    print(f"  batch {old / batch:.1f}x faster\n")
+
+
+def packet_benchmarks():
+    print("SetExtendedColorZones (510), per packet")
+    for count in (8, MAX_EXTENDED_ZONES):
+        zones = payload(count)
+        old = bench(
+            f"bitstring, {count} zones (old)",
+            lambda: BitstringExtendedColorZones("d0:73:d5:40:c6:de", 1, 0, zones),
+            1,
+        )
+        new = bench(
+            f"struct, {count} zones",
+            lambda: SetExtendedColorZones("d0:73:d5:40:c6:de", 1, 0, zones),
+            1,
+        )
+        print(f"  {old / new:.1f}x faster\n")
+
+
+if __name__ == "__main__":
+    kelvin_benchmarks()
+    hsbk_benchmarks()
+    rgb_benchmarks()
+    packet_benchmarks()
@@ -1,6 +1,13 @@
+import functools
+import logging
 import os
 import sys
+import time
 import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from lifxlan.msgtypes import LightSetColor
 
 # color_thread uses package-relative imports, so make the repo root importable
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -8,12 +15,16 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 from lifx_control_panel.utilities.color_thread import (
     ColorCycle,
     ColorThreadRunner,
+    GroupColorThreadRunner,
     _screen_rgb_to_hsbk,
     get_monitor_bounds,
+    hsbk_delta,
     normalize_rectangles,
     config,
 )
+from lifx_control_panel.utilities.transport import LanTransport
 from lifx_control_panel.utilities.utils import Color
+from test.dummy_devices import DummyBulb, DummyGroup, LanBulbSimulator
 
 
 class TestNormalizeRectangles(unittest.TestCase):
@@ -105,5 +116,134 @@ class TestLimitBrightness(unittest.TestCase):
         self.assertEqual(ColorThreadRunner.limit_brightness(10000), 10000)
 
 
+class TestHsbkDelta(unittest.TestCase):
+    def test_identical_colors(self):
+        self.assertEqual(hsbk_delta((100, 200, 300, 3500), (100, 200, 300, 3500)), 0)
+
+    def test_hue_wraps_around(self):
+        red, magenta = (10, 65535, 65535, 3500), (65530, 65535, 65535, 3500)
+        self.assertLess(hsbk_delta(red, magenta), 0.001)
+
+    def test_invisible_components_dont_count(self):
+        # hue means nothing on white, and nothing at all means anything when off
+        self.assertEqual(hsbk_delta((0, 0, 65535, 3500), (30000, 0, 65535, 3500)), 0)
+        self.assertEqual(hsbk_delta((0, 65535, 0, 2500), (30000, 0, 0, 9000)), 0)
+
+    def test_brightness_always_counts(self):
+        self.assertAlmostEqual(hsbk_delta((0, 0, 0, 3500), (0, 0, 65535, 3500)), 1.0)
+
+
+class TestMatchColor(unittest.TestCase):
+    """match_color against a recording bulb, with the effect stopping itself after a few
+    frames."""
+
+    def setUp(self):
+        self._saved = dict(config["AverageColor"])
+        config["AverageColor"]["targetfps"] = "0"
+        config["AverageColor"]["brightnessoffset"] = "0"
+        self.sent = []
+        self.bulb = SimpleNamespace(
+            get_label=lambda: "Bulb",
+            set_color=lambda color, **_: self.sent.append(color),
+        )
+        self.parent = SimpleNamespace(
+            logger=logging.getLogger("test"),
+            get_color_values_hsbk=lambda: Color(0, 0, 0, 3500),
+        )
+
+    def tearDown(self):
+        config["AverageColor"].clear()
+        config["AverageColor"].update(self._saved)
+
+    def run_frames(self, colors, runner_class=ColorThreadRunner, bulb=None):
+        colors = iter(colors)
+
+        def effect(initial_color):
+            color = next(colors, None)
+            if color is None:
+                runner.stop()
+                return initial_color
+            return color
+
+        runner = runner_class(bulb or self.bulb, effect, self.parent)
+        runner.match_color(bulb or self.bulb)
+
+    def test_unchanged_frames_send_nothing(self):
+        self.run_frames([[0, 65535, 30000, 3500]] * 5)
+        self.assertEqual(len(self.sent), 1)
+
+    def test_changed_frames_are_sent(self):
+        self.run_frames([[0, 65535, 30000 + step * 1000, 3500] for step in range(5)])
+        self.assertEqual(len(self.sent), 5)
+
+    def test_frame_rate_is_capped(self):
+        config["AverageColor"]["targetfps"] = "50"
+        started = time.monotonic()
+        self.run_frames([[0, 65535, 30000, 3500]] * 5)
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 50)
+
+    def test_lan_bulb_frames_go_over_the_shared_socket(self):
+        transport = LanTransport().start()
+        self.addCleanup(transport.stop)
+        simulator = LanBulbSimulator(label="Desk")
+        self.addCleanup(simulator.close)
+        device = simulator.device(transport.source_id)
+        device.set_color = lambda *_, **__: self.fail("sent through lifxlan")
+        colors = [[0, 65535, 30000 + step * 1000, 3500] for step in range(3)]
+        with mock.patch(
+            "lifx_control_panel.utilities.color_thread.shared_transport",
+            return_value=transport,
+        ):
+            self.run_frames(colors, bulb=device)
+        sets = lambda: [m for m in simulator.received if isinstance(m, LightSetColor)]
+        deadline = time.monotonic() + 2
+        while len(sets()) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([tuple(m.color) for m in sets()], [tuple(c) for c in colors])
+
+    def test_group_frame_reaches_every_member(self):
+        members = [DummyBulb(label=label) for label in ("A", "B", "C")]
+        colors = [[0, 65535, 30000 + step * 1000, 3500] for step in range(3)]
+        self.run_frames(colors, GroupColorThreadRunner, DummyGroup(members))
+        for member in members:
+            self.assertEqual(tuple(member.get_color()), tuple(colors[-1]))
+
+    def test_group_frames_are_held_to_the_send_budget(self):
+        config["AverageColor"]["groupsendbudget"] = "3"  # one 3-bulb frame a second
+        members = [DummyBulb(label=label) for label in ("A", "B", "C")]
+        sent = []
+        members[0].set_color = lambda color, **_: sent.append(color)
+        colors = [[0, 65535, 30000 + step * 1000, 3500] for step in range(5)]
+        self.run_frames(colors, GroupColorThreadRunner, DummyGroup(members))
+        self.assertEqual(sent, [colors[0]])
+
+    def test_group_members_are_worked_out_when_the_group_changes(self):
+        members = [DummyBulb(label=label) for label in ("A", "B")]
+        asked = []
+
+        def supports_color(label):
+            asked.append(label)
+            return True
+
+        for member in members:
+            member.supports_color = functools.partial(supports_color, member.label)
+        group = DummyGroup(members)
+        colors = iter([[0, 65535, 30000 + step * 1000, 3500] for step in range(6)])
+
+        def effect(initial_color):
+            color = next(colors, None)
+            if color is None:
+                runner.stop()
+                return initial_color
+            if color[2] == 33000:  # a rescan finds another member mid-run
+                group.add_device(DummyBulb(label="C"))
+            return color
+
+        runner = GroupColorThreadRunner(group, effect, self.parent)
+        runner.match_color(group)
+        self.assertEqual(asked, ["A", "B", "A", "B"])
+        self.assertEqual(tuple(group.devices[2].get_color()), (0, 65535, 35000, 3500))
+
+
 if __name__ == "__main__":
     unittest.main()
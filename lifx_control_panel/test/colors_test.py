@@ -0,0 +1,102 @@
+import itertools
+import os
+import sys
+import unittest
+
+import numpy as np
+from lifxlan.utils import RGBtoHSBK
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.colors import (
+    KELVIN_MAX,
+    KELVIN_MIN,
+    hsbk_to_rgb,
+    hsbk_to_rgb_array,
+    kelvin_formula,
+    kelvin_table,
+    kelvin_to_rgb,
+    kelvin_to_rgb_array,
+    rgb_to_hsbk,
+    rgb_to_hsbk_array,
+)
+
+
+class KelvinTableTest(unittest.TestCase):
+    def test_table_is_the_formula(self):
+        for kelvin in range(KELVIN_MIN, KELVIN_MAX + 1):
+            self.assertEqual(kelvin_to_rgb(kelvin), kelvin_formula(kelvin))
+
+    def test_outside_the_table_falls_back_to_the_formula(self):
+        for kelvin in (0, 1000, 1499, 9001, 12000, 2500.5):
+            self.assertEqual(kelvin_to_rgb(kelvin), kelvin_formula(kelvin))
+
+    def test_array_matches_scalar(self):
+        kelvins = [1500, 2700, 0, 9000, 9500, 6500]
+        self.assertEqual(
+            kelvin_to_rgb_array(kelvins).tolist(),
+            [list(kelvin_formula(kelvin)) for kelvin in kelvins],
+        )
+
+    def test_table_is_read_only(self):
+        with self.assertRaises(ValueError):
+            kelvin_table()[0, 0] = 1
+
+
+class HsbkToRgbArrayTest(unittest.TestCase):
+    def assert_matches_scalar(self, colors):
+        self.assertEqual(
+            hsbk_to_rgb_array(colors).tolist(),
+            [list(hsbk_to_rgb(color)) for color in colors],
+        )
+
+    def test_edges_of_every_component(self):
+        levels = (0, 1, 10922, 21845, 32768, 54612, 65534, 65535)
+        kelvins = (0, 1500, 2500, 3500, 6600, 9000, 9500)
+        self.assert_matches_scalar(
+            list(itertools.product(levels, levels, levels[::3], kelvins))
+        )
+
+    def test_random_colors(self):
+        rng = np.random.default_rng(0)
+        colors = np.column_stack(
+            [rng.integers(0, 65536, (5000, 3)), rng.integers(1500, 9001, 5000)]
+        )
+        self.assert_matches_scalar(colors.tolist())
+
+    def test_shape(self):
+        self.assertEqual(hsbk_to_rgb_array((0, 0, 0, 3500)).shape, (1, 3))
+        self.assertEqual(hsbk_to_rgb_array(np.zeros((0, 4))).shape, (0, 3))
+
+
+class RgbToHsbkTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.colors = [tuple(rgb) for rgb in rng.integers(0, 256, (5000, 3)).tolist()]
+        # every hue branch, grays, ties for the brightest channel, near-black noise
+        self.colors += list(itertools.product((0, 1, 9, 10, 128, 254, 255), repeat=3))
+
+    def test_scalar_is_lifxlans(self):
+        for rgb in self.colors:
+            self.assertEqual(rgb_to_hsbk(rgb, 4000), RGBtoHSBK(rgb, 4000))
+
+    def test_array_matches_scalar(self):
+        hsbk = rgb_to_hsbk_array(self.colors, 4000)
+        self.assertEqual(hsbk.dtype, np.uint16)
+        self.assertEqual(
+            [tuple(color) for color in hsbk.tolist()],
+            [rgb_to_hsbk(rgb, 4000) for rgb in self.colors],
+        )
+
+    def test_dark_cutoff_desaturates(self):
+        self.assertEqual(rgb_to_hsbk((9, 0, 9), dark_cutoff=10)[1], 0)
+        self.assertEqual(rgb_to_hsbk((10, 0, 10), dark_cutoff=10)[1], 65535)
+        self.assertEqual(
+            rgb_to_hsbk_array([(9, 0, 9), (10, 0, 10)], dark_cutoff=10)[:, 1].tolist(),
+            [0, 65535],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
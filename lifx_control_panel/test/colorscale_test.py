@@ -0,0 +1,64 @@
+import base64
+import io
+import os
+import sys
+import unittest
+
+from PIL import Image
+
+# colorscale uses package-relative imports, so make the repo root importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.ui.colorscale import gradient_data, gradient_row
+from lifx_control_panel.utilities.utils import hsv_to_rgb, kelvin_to_rgb
+
+
+def per_column(gradient, width, from_, to):
+    """The columns ColorScale._draw_gradient used to compute one at a time."""
+    if gradient == "bw":
+        return [(int(float(x) / width * 255),) * 3 for x in range(width)]
+    if gradient == "wb":
+        return [(int((1 - (float(x) / width)) * 255),) * 3 for x in range(width)]
+    if gradient == "kelvin":
+        return [
+            kelvin_to_rgb(int(((float(x) / width) * (to - from_)) + from_))
+            for x in range(width)
+        ]
+    return [hsv_to_rgb(float(x) / width * 360) for x in range(width)]
+
+
+class GradientRowTest(unittest.TestCase):
+    def test_matches_the_per_column_colors(self):
+        cases = [("bw", 0, 100), ("wb", 0, 100), ("hue", 0, 360)]
+        cases += [("kelvin", 2500, 9000), ("kelvin", 1000, 12000)]
+        for gradient, from_, to in cases:
+            for width in (1, 7, 120, 361, 1000):
+                row = gradient_row(gradient, width, from_, to)
+                self.assertEqual(
+                    [tuple(color) for color in row],
+                    per_column(gradient, width, from_, to),
+                    (gradient, width),
+                )
+
+    def test_unknown_gradient(self):
+        with self.assertRaises(ValueError):
+            gradient_row("sepia", 10, 0, 100)
+
+
+class GradientDataTest(unittest.TestCase):
+    def test_every_row_is_the_gradient(self):
+        data = gradient_data("hue", 30, 4, 0, 360)
+        image = Image.open(io.BytesIO(base64.b64decode(data)))
+        self.assertEqual(image.size, (30, 4))
+        row = [tuple(color) for color in gradient_row("hue", 30, 0, 360)]
+        self.assertEqual(list(image.getdata()), row * 4)
+
+    def test_identical_scales_share_one_rendering(self):
+        self.assertIs(
+            gradient_data("kelvin", 120, 18, 2500, 9000),
+            gradient_data("kelvin", 120, 18, 2500, 9000),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,9 @@
 
 import logging
 import os
+import socket
 import sys
+import threading
 import time
 import traceback
 from tkinter import *
@@ -12,6 +14,19 @@ from typing import Iterable
 
 import lifxlan
 from lifxlan import Group
+from lifxlan.msgtypes import (
+    Acknowledgement,
+    GetHostFirmware,
+    GetPower,
+    LightGet,
+    LightSetColor,
+    LightSetPower,
+    LightState,
+    SetPower,
+    StateHostFirmware,
+    StatePower,
+)
+from lifxlan.unpack import unpack_lifx_message
 
 from utilities.utils import Color as DummyColor
 from utilities.utils import resource_path
@@ -272,6 +287,7 @@ class MultiZoneDummy(DummyBulb):
         self.zones = [self.color] * num_zones
         self.firmware = firmware  # 2.77+ understands SetExtendedColorZones
         self.acked_messages = []
+        self.fired_messages = []
 
     # Multizone API
 
@@ -294,6 +310,16 @@ class MultiZoneDummy(DummyBulb):
             if start + offset < len(self.zones):
                 self.zones[start + offset] = color
 
+    def fire_and_forget(self, msg_type, payload, *_, **__):
+        """req_with_ack minus the ack: SetExtendedColorZones sent rapid. Older firmware
+        drops the unknown message without a word."""
+        self.fired_messages.append(msg_type)
+        if self.firmware >= (2, 77):
+            start = payload["zone_index"]
+            for offset, color in enumerate(payload["colors"]):
+                if start + offset < len(self.zones):
+                    self.zones[start + offset] = color
+
     def set_zone_color(self, start, end, color, duration=0, rapid=False, apply=1):
         # end is INCLUSIVE, matching the real SetColorZones protocol message
         for i in range(start, min(end + 1, len(self.zones))):
@@ -372,6 +398,95 @@ class TileChainDummy(DummyBulb):
         pass
 
 
+class LanBulbSimulator:
+    """A bulb on 127.0.0.1 speaking the real LAN protocol, for code that talks to the wire
+    (LanTransport) rather than to a Device object. Answers the handful of messages this app
+    sends, acks anything that asks, and can be told to drop packets like a lossy Beam."""
+
+    def __init__(
+        self,
+        label="Simulated",
+        color=(0, 0, 65535, 3500),
+        power=65535,
+        mac_addr="d0:73:d5:00:00:01",
+        firmware=(3, 70),
+    ):
+        self.label = label
+        self.color = tuple(color)
+        self.power = power
+        self.mac_addr = mac_addr
+        self.firmware = firmware
+        self.drop = 0  # swallow this many incoming packets without a reply
+        self.silent = False  # swallow everything
+        self.received = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.05)
+        self.port = self.sock.getsockname()[1]
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def device(self, source_id=1234):
+        """A lifxlan.Light addressed at this simulator."""
+        light = lifxlan.Light(self.mac_addr, "127.0.0.1", 1, self.port, source_id)
+        light.label = self.label
+        return light
+
+    def send(self, message_type, payload, addr, source_id=0, seq_num=0):
+        """Push a packet at addr as if this bulb had sent it."""
+        message = message_type(self.mac_addr, source_id, seq_num, payload)
+        self.sock.sendto(message.packed_message, addr)
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self.sock.close()
+
+    def _serve(self):
+        while not self._closed.is_set():
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            message = unpack_lifx_message(data)
+            self.received.append(message)
+            if self.silent:
+                continue
+            if self.drop:
+                self.drop -= 1
+                continue
+            self._handle(message, addr)
+
+    def _handle(self, message, addr):
+        reply = None
+        if isinstance(message, (SetPower, LightSetPower)):
+            self.power = message.power_level
+        elif isinstance(message, LightSetColor):
+            self.color = tuple(message.color)
+        if isinstance(message, GetPower):
+            reply = StatePower, {"power_level": self.power}
+        elif isinstance(message, LightGet):
+            reply = LightState, {
+                "color": self.color,
+                "reserved1": 0,
+                "power_level": self.power,
+                "label": self.label,
+                "reserved2": 0,
+            }
+        elif isinstance(message, GetHostFirmware):
+            major, minor = self.firmware
+            reply = StateHostFirmware, {
+                "build": 0,
+                "reserved1": 0,
+                "version": (major << 16) | minor,
+            }
+        if message.ack_requested:
+            self.send(Acknowledgement, {}, addr, message.source_id, message.seq_num)
+        if message.response_requested and reply is not None:
+            self.send(*reply, addr, message.source_id, message.seq_num)
+
+
 class LifxLANDummy:
     def __init__(self, verbose=False):
         self.devices = {}
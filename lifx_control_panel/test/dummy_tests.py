@@ -98,6 +98,21 @@ class TestMultiZone(unittest.TestCase):
         self.assertEqual(bulb.get_color_zones(), wanted)
         self.assertEqual(sends, [(0, 2), (3, 7)])  # one message per run, not per zone
 
+    def test_rapid_is_one_unacked_packet(self):
+        bulb = MultiZoneDummy(label="Beam", num_zones=8)
+        wanted = [Color(index, 65535, 65535, 3500) for index in range(8)]
+        set_zone_colors(bulb, wanted, rapid=True)
+        self.assertEqual(bulb.get_color_zones(), wanted)
+        self.assertEqual(bulb.fired_messages, [SetExtendedColorZones])
+        self.assertEqual(bulb.acked_messages, [])
+
+    def test_rapid_legacy_never_retries(self):
+        bulb = MultiZoneDummy(label="Old Z", num_zones=2, firmware=(2, 76))
+        sends = []
+        bulb.set_zone_color = lambda *a, **kw: sends.append(kw["rapid"])
+        set_zone_colors(bulb, [Color(1, 2, 3, 3500), Color(4, 5, 6, 3500)], rapid=True)
+        self.assertEqual(sends, [True, True])
+
     def test_legacy_verdict_is_cached(self):
         bulb = MultiZoneDummy(label="Old Z", num_zones=2, firmware=(2, 76))
         set_zone_colors(bulb, [Color(1, 2, 3, 3500)] * 2)
@@ -141,6 +156,22 @@ class TestMultiZone(unittest.TestCase):
         self.assertTrue(supports_extended(bulb))
         self.assertIsNone(getattr(bulb, "supports_extended_multizone", None))
 
+    def test_unanswered_firmware_query_is_not_repeated_at_once(self):
+        bulb = MultiZoneDummy(label="Beam", num_zones=8)
+        queries = []
+
+        def busy(*a, **kw):
+            queries.append(1)
+            raise lifxlan.WorkflowException("busy")
+
+        bulb.req_with_resp = busy
+        for _ in range(3):
+            self.assertTrue(supports_extended(bulb))
+        self.assertEqual(len(queries), 1)
+        bulb.firmware_retry_at = 0  # the retry interval has passed
+        self.assertTrue(supports_extended(bulb))
+        self.assertEqual(len(queries), 2)
+
     def test_legacy_retries_then_raises(self):
         bulb = MultiZoneDummy(label="Old Z", num_zones=2, firmware=(2, 76))
         attempts = []
@@ -0,0 +1,204 @@
+import base64
+import io
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from PIL import Image
+
+# icon_list uses package-relative imports, so make the repo root importable
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.ui.icon_list import (
+    COLOR_CODE,
+    HIGHLIGHT_SATURATION,
+    SCROLL_MARGIN,
+    BulbIconList,
+    IconRenderer,
+    IconSlot,
+    quantize_hsbk,
+)
+from lifx_control_panel.utilities.utils import resource_path
+
+
+def per_pixel(source, level, rgb, selected):
+    """The sprite update_icon and set_selected_bulb used to build, pixel by pixel."""
+    pixels = source.load()
+    out = []
+    for y in range(source.height):
+        row = []
+        for x in range(source.width):
+            *icon_rgb, alpha = pixels[x, y]
+            if alpha == 255 and all(
+                v <= level or v == COLOR_CODE["BULB_TOP"] for v in icon_rgb
+            ):
+                color = rgb
+            elif alpha == 255 and all(v == COLOR_CODE["BACKGROUND"] for v in icon_rgb):
+                color = (
+                    HIGHLIGHT_SATURATION if selected else COLOR_CODE["BACKGROUND"],
+                ) * 3
+            else:
+                color = tuple(icon_rgb)
+            row.append([*color, alpha])
+        out.append(row)
+    return out
+
+
+class IconRendererTest(unittest.TestCase):
+    def setUp(self):
+        self.source = Image.open(resource_path("res/lightbulb.png")).convert("RGBA")
+        self.renderer = IconRenderer(self.source)
+
+    def test_matches_the_per_pixel_rules(self):
+        for level in (-1, 0, 4, 9):
+            for selected in (False, True):
+                self.assertEqual(
+                    self.renderer.render(level, (200, 30, 90), selected).tolist(),
+                    per_pixel(self.source, level, (200, 30, 90), selected),
+                )
+
+    def test_off_bulb_lights_only_the_top(self):
+        sprite = self.renderer.render(-1, (1, 2, 3))
+        lit = (sprite[:, :, :3] == (1, 2, 3)).all(axis=2)
+        top = (self.renderer.base[:, :, :3] == COLOR_CODE["BULB_TOP"]).all(axis=2)
+        self.assertTrue(lit.any())
+        self.assertTrue((lit == top).all())
+
+    def test_no_level_leaves_ticks_as_drawn(self):
+        sprite = self.renderer.render(selected=True)
+        changed = (sprite != self.renderer.base).any(axis=2)
+        self.assertTrue((changed == self.renderer.background).all())
+
+    def test_photo_data_is_the_rendered_png(self):
+        data = self.renderer.photo_data(5, (10, 20, 30), True)
+        decoded = Image.open(io.BytesIO(base64.b64decode(data)))
+        self.assertEqual(
+            list(decoded.getdata()),
+            [
+                tuple(p)
+                for p in self.renderer.render(5, (10, 20, 30), True)
+                .reshape(-1, 4)
+                .tolist()
+            ],
+        )
+
+
+def icon_list(labels):
+    """A BulbIconList built without Tk: canvas, scrollbar and sprites are mocks, and a
+    sprite's data is the state it was filled with."""
+    icons = BulbIconList.__new__(BulbIconList)
+    icons.is_group = False
+    icons.icon_width, icons.icon_height, icons.icon_padding = 50, 75, 5
+    icons.scroll_x = icons.scroll_y = 0
+    icons.canvas = mock.Mock()
+    icons.h_scroll = mock.Mock()
+    icons.master = mock.Mock()
+    icons.master.bulb_interface.color_cache = {}
+    icons.master.bulb_interface.power_cache = {}
+    icons._photo_data = lambda *state: state
+    icons.bulb_dict, icons._icon_states, icons._slots = {}, {}, {}
+    icons._free_slots = []
+    icons._current_icon = None
+    icons._new_slot = lambda: IconSlot(mock.Mock(), mock.Mock(), mock.Mock())
+    for label in labels:
+        icons.draw_bulb_icon(SimpleNamespace(label=label), label)
+    return icons
+
+
+def shown(slot):
+    return slot.sprite.configure.call_args.kwargs["data"]
+
+
+class SelectionTest(unittest.TestCase):
+    def setUp(self):
+        self.icons = icon_list("AB")
+        self.icons._icon_states["A"] = (4, (1, 2, 3), False)
+        self.icons._icon_states["B"] = (-1, (0, 0, 0), False)
+        self.icons._on_view_change("0.0", "1.0")
+        self.a, self.b = self.icons._slots["A"], self.icons._slots["B"]
+
+    def test_selecting_redraws_the_icon_once_highlighted(self):
+        self.icons.set_selected_bulb("A")
+        self.assertEqual(shown(self.a), (4, (1, 2, 3), True))
+        self.assertEqual(self.a.sprite.configure.call_count, 2)  # drawn, then selected
+
+    def test_selecting_another_clears_the_first(self):
+        self.icons.set_selected_bulb("A")
+        self.icons.set_selected_bulb("B")
+        self.assertEqual(shown(self.a), (4, (1, 2, 3), False))
+        self.assertEqual(shown(self.b), (-1, (0, 0, 0), True))
+        self.assertEqual(self.icons.current_icon, "B")
+
+    def test_reselecting_draws_nothing(self):
+        self.icons.set_selected_bulb("A")
+        self.icons.set_selected_bulb("A")
+        self.assertEqual(self.a.sprite.configure.call_count, 2)
+
+    def test_unknown_label_raises_key_error(self):
+        # Callers pick bulb_icons or group_icons by device type; a wrong pick is a bug
+        with self.assertRaises(KeyError):
+            self.icons.set_selected_bulb("C")
+
+
+class VirtualizationTest(unittest.TestCase):
+    def setUp(self):
+        self.labels = [f"Bulb {n}" for n in range(100)]
+        self.icons = icon_list(self.labels)
+
+    def test_only_icons_in_view_get_slots(self):
+        self.icons._on_view_change("0.0", "0.05")  # 5 icons wide
+        self.assertEqual(list(self.icons._slots), self.labels[: 5 + SCROLL_MARGIN])
+
+    def test_scrolling_recycles_slots(self):
+        self.icons._on_view_change("0.25", "0.5")
+        slots = set(map(id, self.icons._slots.values()))
+        self.icons._on_view_change("0.5", "0.75")
+        self.assertEqual(set(map(id, self.icons._slots.values())), slots)
+        self.assertEqual(
+            list(self.icons._slots),
+            self.labels[50 - SCROLL_MARGIN : 75 + SCROLL_MARGIN],
+        )
+
+    def test_off_screen_update_waits_until_scrolled_to(self):
+        self.icons._on_view_change("0.0", "0.05")
+        cache = self.icons.master.bulb_interface
+        cache.color_cache["Bulb 60"] = (0, 0, 65535, 3500)
+        cache.power_cache["Bulb 60"] = 65535
+        self.icons.update_icon(SimpleNamespace(label="Bulb 60"))
+        self.assertNotIn("Bulb 60", self.icons._slots)
+        self.icons._on_view_change("0.6", "0.65")
+        self.assertEqual(shown(self.icons._slots["Bulb 60"])[0], 9)
+
+    def test_nearby_colors_share_a_cache_entry(self):
+        self.icons._on_view_change("0.0", "0.05")
+        slot = self.icons._slots["Bulb 0"]
+        cache = self.icons.master.bulb_interface
+        cache.power_cache["Bulb 0"] = 65535
+        keys = []
+        for color in ((21000, 40000, 50000, 3500), (21300, 40500, 49800, 3600)):
+            cache.color_cache["Bulb 0"] = color
+            self.icons.update_icon(SimpleNamespace(label="Bulb 0"))
+            keys.append(shown(slot))
+        self.assertEqual(keys[0], keys[1])
+        # drawn, then colored once: the second color is the same sprite
+        self.assertEqual(slot.sprite.configure.call_count, 2)
+
+    def test_distinct_colors_stay_distinct(self):
+        self.assertNotEqual(
+            quantize_hsbk((0, 65535, 65535, 3500)),
+            quantize_hsbk((21845, 65535, 65535, 3500)),
+        )
+        self.assertEqual(quantize_hsbk((65500, 65535, 65535, 3500))[0], 0)  # hue wraps
+
+    def test_removal_moves_later_icons_left(self):
+        self.icons._on_view_change("0.0", "0.05")
+        self.icons.remove_bulb_icon("Bulb 0")
+        slot = self.icons._slots["Bulb 1"]
+        self.icons.canvas.coords.assert_any_call(slot.text, 25.0, 47.5)
+        self.assertEqual(self.icons.scroll_x, 99 * 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
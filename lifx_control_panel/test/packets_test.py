@@ -0,0 +1,100 @@
+import os
+import sys
+import unittest
+
+import bitstring
+from lifxlan.message import BROADCAST_MAC, Message, little_endian
+from lifxlan.msgtypes import GetPower, SetPower
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.multizone import (
+    MAX_EXTENDED_ZONES,
+    SetExtendedColorZones,
+)
+from lifx_control_panel.utilities.packets import pack_header
+
+
+class BitstringExtendedColorZones(Message):
+    """SetExtendedColorZones as it was packed before: bitstring, field by field."""
+
+    def __init__(self, target_addr, source_id, seq_num, payload, **flags):
+        self.duration = payload["duration"]
+        self.apply = payload["apply"]
+        self.zone_index = payload["zone_index"]
+        self.colors = payload["colors"]
+        super().__init__(510, target_addr, source_id, seq_num, **flags)
+
+    def get_payload(self):
+        payload = (
+            little_endian(bitstring.pack("32", self.duration))
+            + little_endian(bitstring.pack("8", self.apply))
+            + little_endian(bitstring.pack("16", self.zone_index))
+            + little_endian(bitstring.pack("8", len(self.colors)))
+        )
+        padded = list(self.colors) + [(0, 0, 0, 0)] * (
+            MAX_EXTENDED_ZONES - len(self.colors)
+        )
+        for color in padded:
+            payload += b"".join(
+                little_endian(bitstring.pack("16", field)) for field in color
+            )
+        return payload
+
+
+def payload(count, duration=0, apply=1, zone_index=0):
+    colors = [
+        ((n * 7919) % 65536, 65535 - n, (n * 257) % 65536, 1500 + n * 91)
+        for n in range(count)
+    ]
+    return {
+        "duration": duration,
+        "apply": apply,
+        "zone_index": zone_index,
+        "colors": colors,
+    }
+
+
+class ExtendedColorZonesTest(unittest.TestCase):
+    def assertSamePacket(self, *args, **flags):
+        self.assertEqual(
+            SetExtendedColorZones(*args, **flags).packed_message,
+            BitstringExtendedColorZones(*args, **flags).packed_message,
+            (args[:3], flags),
+        )
+
+    def test_payloads_match_bitstring(self):
+        for count in (0, 1, 8, 61, MAX_EXTENDED_ZONES):
+            self.assertSamePacket("d0:73:d5:40:c6:de", 1234, 7, payload(count))
+        self.assertSamePacket(
+            "d0:73:d5:40:c6:de",
+            1234,
+            7,
+            payload(16, duration=2**32 - 1, apply=2, zone_index=65535),
+        )
+
+    def test_headers_match_bitstring(self):
+        for mac in ("d0:73:d5:40:c6:de", "ff:ff:ff:ff:ff:ff", BROADCAST_MAC):
+            for source_id in (0, 1, 2**32 - 1):
+                for seq_num in (0, 255):
+                    for ack, res in ((False, False), (True, False), (False, True)):
+                        self.assertSamePacket(
+                            mac,
+                            source_id,
+                            seq_num,
+                            payload(3),
+                            ack_requested=ack,
+                            response_requested=res,
+                        )
+
+    def test_pack_header_fits_any_message(self):
+        for message in (
+            GetPower("d0:73:d5:01:02:03", 99, 12, {}, response_requested=True),
+            SetPower(BROADCAST_MAC, 5, 200, {"power_level": 65535}, ack_requested=True),
+        ):
+            self.assertEqual(pack_header(message, len(message.payload)), message.header)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import logging
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.frames import LightFrame, PendingFrame
+from lifx_control_panel.ui.settings import default_colors
+from test.dummy_devices import DummyBulb
+
+
+class PendingFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.bulb = DummyBulb(label="Lamp")
+        self.built = []
+
+        def frame_class(master, target):
+            self.built.append((master, target.power_level, tuple(target.color)))
+            return "frame"
+
+        self.pending = PendingFrame(frame_class, "master", self.bulb)
+
+    def test_state_is_kept_on_the_device(self):
+        self.pending.hold_state(power=65535, color=(4, 5, 6, 3500))
+        self.assertEqual(self.bulb.power_level, 65535)
+        self.assertEqual(self.bulb.color, (4, 5, 6, 3500))
+
+    def test_only_what_changed_is_kept(self):
+        self.bulb.color = (1, 2, 3, 3500)
+        self.pending.hold_state(power=0)
+        self.assertEqual(self.bulb.color, (1, 2, 3, 3500))
+
+    def test_frame_is_built_from_current_state(self):
+        self.pending.hold_state(power=65535, color=(7, 8, 9, 2700))
+        self.assertEqual(self.pending.build(), "frame")
+        self.assertEqual(self.built, [("master", 65535, (7, 8, 9, 2700))])
+
+
+class HeldStateTest(unittest.TestCase):
+    """hold_state and restart, unbound, on a stand-in for a hidden LightFrame."""
+
+    def setUp(self):
+        self.applied = []
+        self.frame = SimpleNamespace(
+            _held_state=None,
+            logger=logging.getLogger("test"),
+            apply_state=lambda **state: self.applied.append(state),
+        )
+
+    def test_hidden_frame_shows_only_the_newest_state(self):
+        LightFrame.hold_state(self.frame, power=0, color=(1, 2, 3, 3500))
+        LightFrame.hold_state(self.frame, color=(4, 5, 6, 3500))
+        LightFrame.hold_state(self.frame, power=65535)
+        self.assertEqual(self.applied, [])
+        LightFrame.restart(self.frame)
+        self.assertEqual(self.applied, [{"power": 65535, "color": (4, 5, 6, 3500)}])
+
+    def test_nothing_held_applies_nothing(self):
+        LightFrame.restart(self.frame)
+        LightFrame.hold_state(self.frame, power=0)
+        LightFrame.restart(self.frame)
+        LightFrame.restart(self.frame)
+        self.assertEqual(self.applied, [{"power": 0}])
+
+
+class DefaultColorsTest(unittest.TestCase):
+    def test_settings_read_presets_without_a_frame(self):
+        self.assertIs(default_colors(), LightFrame.default_colors)
+        self.assertIn("RED", default_colors())
+
+
+if __name__ == "__main__":
+    unittest.main()
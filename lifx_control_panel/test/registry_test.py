@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import lifxlan
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.registry import (
+    DeviceRecord,
+    DeviceRegistry,
+    probe_devices,
+)
+from lifx_control_panel.utilities.transport import LanTransport
+from test.dummy_devices import LanBulbSimulator
+
+
+class RegistryFileTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.registry = DeviceRegistry(os.path.join(directory.name, "devices.json"))
+
+    def test_round_trip(self):
+        records = [
+            DeviceRecord("d0:73:d5:00:00:01", "10.0.0.2", 56700, 27, "Desk", "Office"),
+            DeviceRecord(
+                "d0:73:d5:00:00:02", "10.0.0.3", 56700, 38, "Beam", None, 61, True
+            ),
+        ]
+        self.registry.save(records)
+        self.assertEqual(list(self.registry.load().values()), records)
+
+    def test_missing_file_is_empty(self):
+        self.assertEqual(self.registry.load(), {})
+
+    def test_corrupt_file_is_empty(self):
+        with open(self.registry.path, "w", encoding="utf-8") as file:
+            file.write("{not json")
+        with self.assertLogs("root", "WARNING"):
+            self.assertEqual(self.registry.load(), {})
+
+    def test_record_builds_the_right_device(self):
+        beam = DeviceRecord(
+            "d0:73:d5:00:00:02", "10.0.0.3", 56700, 38, "Beam", None, 61, False
+        ).to_device(1234)
+        self.assertIsInstance(beam, lifxlan.MultiZoneLight)
+        self.assertEqual((beam.label, beam.product), ("Beam", 38))
+        self.assertFalse(beam.supports_extended_multizone)
+        bulb = DeviceRecord(
+            "d0:73:d5:00:00:01", "10.0.0.2", 56700, 27, "Desk"
+        ).to_device(1234)
+        self.assertNotIsInstance(bulb, lifxlan.MultiZoneLight)
+
+    def test_strip_saved_before_its_zones_were_counted_is_still_multizone(self):
+        # Frames are built when first selected, so a strip is often saved with zones=None
+        beam = DeviceRecord("d0:73:d5:00:00:02", "10.0.0.3", 56700, 38, "Beam")
+        self.assertIsInstance(beam.to_device(1234), lifxlan.MultiZoneLight)
+
+
+class ProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = LanTransport().start()
+        self.addCleanup(self.transport.stop)
+
+    def simulator(self, **kwargs):
+        bulb = LanBulbSimulator(**kwargs)
+        self.addCleanup(bulb.close)
+        return bulb
+
+    def record(self, bulb):
+        return DeviceRecord(bulb.mac_addr, "127.0.0.1", bulb.port, 27, "stale label")
+
+    def test_answering_devices_come_back_with_state(self):
+        desk = self.simulator(label="Desk", color=(1, 2, 3, 3500), power=0)
+        gone = self.simulator(mac_addr="d0:73:d5:00:00:02")
+        gone.silent = True
+        devices = DeviceRegistry.probe(
+            self.transport, [self.record(desk), self.record(gone)]
+        )
+        self.assertEqual([device.mac_addr for device in devices], [desk.mac_addr])
+        self.assertEqual(devices[0].label, "Desk")
+        self.assertEqual(devices[0].color, (1, 2, 3, 3500))
+        self.assertEqual(devices[0].power_level, 0)
+        self.assertEqual(devices[0].product, 27)
+
+    def test_probe_devices_leaves_devices_alone(self):
+        desk = self.simulator(label="Desk")
+        device = desk.device(self.transport.source_id)
+        device.label = "Old name"
+        ((answered, state),) = probe_devices(self.transport, [device])
+        self.assertIs(answered, device)
+        self.assertEqual((device.label, state.label), ("Old name", "Desk"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,9 +12,11 @@ from test.dummy_devices import DummyBulb, MultiZoneDummy
 
 
 class Stub:
-    """Just enough of LifxFrame for the unbound _prefetch_state call."""
+    """Just enough of LifxFrame for the unbound _prefetch_state/_classify calls."""
 
     logger = logging.getLogger("scan_prefetch_test")
+    _classify = LifxFrame._classify
+    _prefetch_state = LifxFrame._prefetch_state
 
 
 class FlakyBulb(DummyBulb):
@@ -42,6 +44,33 @@ class PrefetchTest(unittest.TestCase):
         self.assertEqual(len(logs.records), 3)  # SCAN_ATTEMPTS
 
 
+class ClassifyTest(unittest.TestCase):
+    def light(self, product):
+        light = lifxlan.Light("d0:73:d5:00:00:01", "10.0.0.2", 1, 56700, 1)
+        light.product = product  # as discovery caches it; nothing goes on the wire
+        return light
+
+    def test_multizone_product_is_rebuilt(self):
+        beam = LifxFrame._classify(Stub(), self.light(38))
+        self.assertIsInstance(beam, lifxlan.MultiZoneLight)
+        self.assertEqual((beam.mac_addr, beam.product), ("d0:73:d5:00:00:01", 38))
+
+    def test_plain_bulb_is_kept(self):
+        bulb = self.light(27)
+        self.assertIs(LifxFrame._classify(Stub(), bulb), bulb)
+
+    def test_dummies_pass_through(self):
+        strip = MultiZoneDummy(label="Beam")
+        self.assertIs(LifxFrame._classify(Stub(), strip), strip)
+
+    def test_prefetch_pass_returns_device_and_group(self):
+        bulb = DummyBulb(label="Kitchen")
+        self.assertEqual(
+            LifxFrame._classify_and_prefetch(Stub(), bulb),
+            (bulb, bulb.get_group_label()),
+        )
+
+
 class CachedTest(unittest.TestCase):
     def test_prefers_cached_value(self):
         self.assertEqual(_cached(DummyBulb(label="Lamp"), "label", self.fail), "Lamp")
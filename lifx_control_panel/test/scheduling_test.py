@@ -0,0 +1,103 @@
+import os
+import sys
+import unittest
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.scheduling import (
+    MAX_BACKOFF,
+    HeartbeatScheduler,
+    SendBudget,
+)
+
+
+class HeartbeatSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = HeartbeatScheduler(focus_interval=3)
+        self.scheduler.add("Desk", 30, now=0)
+        self.scheduler.add("Beam", 30, now=0)
+
+    def test_new_devices_are_due_at_once(self):
+        self.assertEqual(sorted(self.scheduler.pop_due(now=0)), ["Beam", "Desk"])
+
+    def test_answered_device_waits_its_interval(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.completed("Desk", 0.05, now=1)
+        self.assertNotIn("Desk", self.scheduler.pop_due(now=30))
+        self.assertEqual(self.scheduler.pop_due(now=31), ["Desk"])
+
+    def test_focused_device_is_polled_fastest(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.set_focus("Desk", now=0)
+        self.scheduler.completed("Desk", 0.05, now=0)
+        self.scheduler.completed("Beam", 0.05, now=0)
+        self.assertEqual(self.scheduler.pop_due(now=3), ["Desk"])
+
+    def test_timeouts_back_off_exponentially(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.failed("Beam", now=0)
+        self.assertEqual(self.scheduler.interval("Beam"), 60)
+        self.scheduler.pop_due(now=60)
+        self.scheduler.failed("Beam", now=60)
+        self.assertEqual(self.scheduler.interval("Beam"), 120)
+        for _ in range(10):
+            self.scheduler.stats["Beam"].record_timeout()
+        self.assertEqual(self.scheduler.interval("Beam"), MAX_BACKOFF)
+        self.scheduler.completed("Beam", 0.05, now=61)
+        self.assertEqual(self.scheduler.interval("Beam"), 30)
+
+    def test_in_flight_device_is_not_polled_again(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.set_focus("Desk", now=1)
+        self.assertEqual(self.scheduler.pop_due(now=1), [])
+        self.scheduler.completed("Desk", 0.05, now=2)
+        self.assertEqual(self.scheduler.pop_due(now=5), ["Desk"])
+
+    def test_heard_device_is_pushed_back(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.completed("Desk", 0.05, now=0)
+        self.scheduler.heard("Desk", now=20)
+        self.assertEqual(self.scheduler.pop_due(now=40), [])
+        self.assertEqual(self.scheduler.next_due_in(now=40), 10)
+
+    def test_poll_soon_makes_a_device_due_now(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.completed("Desk", 0.05, now=0)
+        self.scheduler.poll_soon("Desk", now=5)
+        self.assertEqual(self.scheduler.pop_due(now=5), ["Desk"])
+        self.scheduler.poll_soon("Gone", now=5)  # unknown labels are ignored
+
+    def test_stats_track_rtt_and_loss(self):
+        self.scheduler.pop_due(now=0)
+        self.scheduler.completed("Desk", 0.1, now=0)
+        self.scheduler.failed("Beam", now=0)
+        snapshot = self.scheduler.snapshot(now=0)
+        self.assertEqual(snapshot["Desk"]["rtt_ms"], 100.0)
+        self.assertEqual(snapshot["Desk"]["loss"], 0)
+        self.assertGreater(snapshot["Beam"]["loss"], 0)
+        self.assertEqual(snapshot["Beam"]["due_in"], 60)
+
+
+class SendBudgetTest(unittest.TestCase):
+    def test_spends_up_to_the_rate(self):
+        budget = SendBudget(10, now=0)
+        self.assertTrue(budget.spend(6, now=0))
+        self.assertFalse(budget.spend(6, now=0))
+        self.assertTrue(budget.spend(6, now=0.2))  # 4 left + 2 earned
+
+    def test_refill_is_capped_at_one_second(self):
+        budget = SendBudget(10, now=0)
+        budget.spend(10, now=0)
+        self.assertTrue(budget.spend(10, now=60))
+        self.assertFalse(budget.spend(1, now=60))
+
+    def test_batch_bigger_than_the_budget_still_goes_out(self):
+        budget = SendBudget(5, now=0)
+        self.assertTrue(budget.spend(8, now=0))
+        self.assertFalse(budget.spend(8, now=1))  # paying back the overdraft
+        self.assertTrue(budget.spend(8, now=1.6))
+
+
+if __name__ == "__main__":
+    unittest.main()
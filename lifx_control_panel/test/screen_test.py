@@ -0,0 +1,216 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities import screen
+from lifx_control_panel.utilities.screen import (
+    FrameTimings,
+    as_array,
+    dominant_rgb,
+    mean_rgb,
+    zone_rgbs,
+)
+
+
+def shot(pixels, padding=0):
+    """A stand-in for an mss ScreenShot holding the given rows of BGRA pixels."""
+    height, width = len(pixels), len(pixels[0])
+    raw = bytearray()
+    for row in pixels:
+        for pixel in row:
+            raw += bytes(pixel)
+        raw += bytes(padding)
+    return SimpleNamespace(raw=raw, width=width, height=height)
+
+
+class AsArrayTest(unittest.TestCase):
+    def test_is_a_view_of_the_shot(self):
+        frame = shot([[(1, 2, 3, 255), (4, 5, 6, 255)]])
+        array = as_array(frame)
+        self.assertEqual(array.shape, (1, 2, 4))
+        frame.raw[0] = 9
+        self.assertEqual(array[0, 0, 0], 9)
+
+    def test_row_padding_is_dropped(self):
+        frame = shot([[(1, 2, 3, 255)], [(4, 5, 6, 255)]], padding=8)
+        self.assertEqual(as_array(frame)[:, :, :3].tolist(), [[[1, 2, 3]], [[4, 5, 6]]])
+
+
+class MeanRgbTest(unittest.TestCase):
+    def test_mean_of_a_two_color_frame(self):
+        bgra = np.zeros((4, 4, 4), dtype=np.uint8)
+        bgra[:, :2] = (255, 0, 0, 255)  # blue
+        bgra[:, 2:] = (0, 0, 255, 255)  # red
+        self.assertEqual(mean_rgb(bgra, stride=1), (128, 0, 128))
+
+    def test_stride_samples_rows(self):
+        bgra = np.zeros((8, 8, 4), dtype=np.uint8)
+        bgra[::4] = (0, 200, 0, 255)
+        self.assertEqual(mean_rgb(bgra, stride=4), (0, 200, 0))
+
+
+class ZoneRgbsTest(unittest.TestCase):
+    def setUp(self):
+        self.bgra = np.zeros((4, 10, 4), dtype=np.uint8)
+        self.bgra[:, :5] = (0, 0, 200, 255)  # red
+        self.bgra[:, 5:] = (100, 0, 0, 255)  # blue
+
+    def test_one_color_per_column_left_to_right(self):
+        self.assertEqual(zone_rgbs(self.bgra, 2, stride=1), [(200, 0, 0), (0, 0, 100)])
+
+    def test_zone_straddling_an_edge_is_mixed(self):
+        # the middle of 3 zones covers columns 3-5: two red, one blue
+        self.assertEqual(zone_rgbs(self.bgra, 3, stride=1)[1], (133, 0, 33))
+
+    def test_more_zones_than_columns(self):
+        colors = zone_rgbs(self.bgra, 82, stride=1)
+        self.assertEqual(len(colors), 82)
+        self.assertEqual((colors[0], colors[-1]), ((200, 0, 0), (0, 0, 100)))
+
+
+class DominantRgbTest(unittest.TestCase):
+    def frame(self, *areas):
+        """A 16x16 BGRA frame filled column-wise with (rgb, columns) areas."""
+        bgra = np.zeros((16, 16, 4), dtype=np.uint8)
+        start = 0
+        for (red, green, blue), columns in areas:
+            bgra[:, start : start + columns] = (blue, green, red, 255)
+            start += columns
+        return bgra
+
+    def test_largest_area_wins(self):
+        bgra = self.frame(((200, 10, 10), 10), ((10, 10, 200), 6))
+        self.assertEqual(dominant_rgb(bgra, stride=1), (200, 10, 10))
+
+    def test_near_identical_shades_count_as_one_color(self):
+        bgra = self.frame(((10, 200, 10), 6), ((200, 10, 10), 5), ((201, 11, 9), 5))
+        self.assertEqual(dominant_rgb(bgra, stride=1), (200, 10, 10))
+
+    def test_black_bars_are_ignored(self):
+        bgra = self.frame(((2, 2, 2), 12), ((10, 10, 200), 4))
+        self.assertEqual(dominant_rgb(bgra, stride=1), (10, 10, 200))
+        self.assertEqual(dominant_rgb(bgra, stride=1, ignore_extremes=False), (2, 2, 2))
+
+    def test_all_black_screen_is_black(self):
+        self.assertEqual(dominant_rgb(self.frame(), stride=1), (0, 0, 0))
+
+
+class ThreadCaptureTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(screen.mss, "mss")
+        self.mss = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mss.return_value.grab.return_value = shot([[(0, 0, 0, 255)]])
+        self.addCleanup(screen.close_thread_capture)
+
+    def test_one_session_serves_every_frame(self):
+        for _ in range(3):
+            screen.thread_capture().grab({})
+        self.assertEqual(self.mss.call_count, 1)
+
+    def test_each_thread_has_its_own(self):
+        other = []
+        thread = threading.Thread(target=lambda: other.append(screen.thread_capture()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], screen.thread_capture())
+
+    def test_close_ends_the_session(self):
+        screen.thread_capture().grab({})
+        screen.close_thread_capture()
+        self.mss.return_value.close.assert_called_once()
+        screen.thread_capture().grab({})
+        self.assertEqual(self.mss.call_count, 2)
+
+
+class SharedFramesTest(unittest.TestCase):
+    LEFT = {"left": 0, "top": 0, "width": 100, "height": 50}
+    RIGHT = {"left": 100, "top": 0, "width": 100, "height": 50}
+
+    def setUp(self):
+        patcher = mock.patch.object(screen.mss, "mss")
+        self.mss = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(screen.close_thread_capture)
+        session = self.mss.return_value
+        session.monitors = [
+            {"left": 0, "top": 0, "width": 200, "height": 50},
+            self.LEFT,
+            self.RIGHT,
+        ]
+        session.grab.side_effect = self.fake_grab
+        self.frames = screen.SharedFrames()
+
+    @staticmethod
+    def fake_grab(region):
+        """A screen whose every pixel holds its own coordinates: blue = x, green = y."""
+        return shot(
+            [
+                [
+                    (x, y, 0, 255)
+                    for x in range(region["left"], region["left"] + region["width"])
+                ]
+                for y in range(region["top"], region["top"] + region["height"])
+            ]
+        )
+
+    def grabbed(self):
+        return [call.args[0] for call in self.mss.return_value.grab.call_args_list]
+
+    def test_crop_is_the_region_asked_for(self):
+        self.frames.grab(self.LEFT, max_age=1)
+        crop = self.frames.grab({"left": 10, "top": 20, "width": 5, "height": 3}, 1)
+        self.assertEqual(crop.shape, (3, 5, 4))
+        self.assertEqual(tuple(crop[0, 0, :2]), (10, 20))
+        self.assertEqual(self.frames.captures, 1)
+
+    def test_fresh_frame_serves_every_region_on_it(self):
+        small = {"left": 10, "top": 10, "width": 10, "height": 10}
+        self.frames.grab(small, max_age=1)
+        self.frames.grab(self.LEFT, max_age=1)  # not covered yet: captures both
+        self.assertEqual(self.grabbed()[-1], self.LEFT)
+        self.frames.grab(small, max_age=1)
+        self.frames.grab(self.LEFT, max_age=1)
+        self.assertEqual(self.frames.captures, 2)
+
+    def test_stale_frame_is_recaptured_for_everyone(self):
+        small = {"left": 10, "top": 10, "width": 10, "height": 10}
+        self.frames.grab(self.LEFT, max_age=1)
+        self.frames.grab(small, max_age=0)
+        self.assertEqual(self.grabbed()[-1], self.LEFT)  # the union, not just small
+
+    def test_monitors_are_captured_separately(self):
+        self.frames.grab(self.LEFT, max_age=1)
+        self.frames.grab(self.RIGHT, max_age=1)
+        self.assertEqual(self.grabbed(), [self.LEFT, self.RIGHT])
+
+    def test_regions_no_one_asks_for_are_dropped(self):
+        small = {"left": 10, "top": 10, "width": 10, "height": 10}
+        self.frames.grab(self.LEFT, max_age=1)
+        with mock.patch.object(screen, "REGION_TTL", 0):
+            time.sleep(0.01)
+            self.frames.grab(small, max_age=0)
+        self.assertEqual(self.grabbed()[-1], small)
+
+
+class FrameTimingsTest(unittest.TestCase):
+    def test_records_each_stage(self):
+        timings = FrameTimings()
+        timings.record("capture", 0.002)
+        with timings.timed("average"):
+            pass
+        self.assertEqual(set(timings.stages), {"capture", "average"})
+        self.assertIn("capture 2.0 ms", timings.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
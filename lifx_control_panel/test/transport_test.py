@@ -0,0 +1,128 @@
+"""LanTransport against simulated bulbs on the loopback interface."""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+import lifxlan
+from lifxlan.msgtypes import GetPower, LightGet, LightSetColor, LightState, StatePower
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.transport import LanTransport, is_lan_device
+from test.dummy_devices import DummyBulb, LanBulbSimulator
+
+
+class TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.transport = LanTransport().start()
+        self.addCleanup(self.transport.stop)
+        self.bulb = LanBulbSimulator(label="Desk", color=(100, 200, 300, 3500))
+        self.addCleanup(self.bulb.close)
+        self.device = self.bulb.device(self.transport.source_id)
+
+    def call(self, coro):
+        return self.transport.submit(coro).result(timeout=5)
+
+    def test_get_returns_the_reply(self):
+        state = self.call(self.transport.get(self.device, LightGet, LightState))
+        self.assertEqual(tuple(state.color), (100, 200, 300, 3500))
+        self.assertEqual(state.label, "Desk")
+
+    def test_ack_waits_for_the_device(self):
+        payload = {"color": (1, 2, 3, 4000), "duration": 0}
+        self.call(self.transport.ack(self.device, LightSetColor, payload))
+        self.assertEqual(self.bulb.color, (1, 2, 3, 4000))
+
+    def test_set_does_not_wait(self):
+        payload = {"color": (5, 6, 7, 4000), "duration": 0}
+        self.call(self.transport.set(self.device, LightSetColor, payload))
+        deadline = time.time() + 2
+        while self.bulb.color != (5, 6, 7, 4000) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.bulb.color, (5, 6, 7, 4000))
+        self.assertFalse(self.bulb.received[-1].ack_requested)
+
+    def test_unwatched_set_logs_its_failure(self):
+        with self.assertLogs("root", "ERROR") as logs:
+            future = self.transport.submit_and_forget(
+                self.transport.set(self.device, LightSetColor, {"color": "red"})
+            )
+            with self.assertRaises(Exception):
+                future.result(timeout=5)
+            deadline = time.time() + 2
+            while not logs.output and time.time() < deadline:
+                time.sleep(0.01)
+        self.assertIn("Unwatched send failed", logs.output[0])
+
+    def test_set_all_reaches_every_device(self):
+        other = LanBulbSimulator(label="Lamp", mac_addr="d0:73:d5:00:00:02")
+        self.addCleanup(other.close)
+        payload = {"color": (5, 6, 7, 4000), "duration": 0}
+        self.call(
+            self.transport.set_all(
+                [self.device, other.device(self.transport.source_id)],
+                LightSetColor,
+                payload,
+            )
+        )
+        deadline = time.time() + 2
+        while (self.bulb.color, other.color) != ((5, 6, 7, 4000),) * 2:
+            if time.time() > deadline:
+                self.fail("a device never got its color")
+            time.sleep(0.01)
+
+    def test_replies_are_matched_to_their_request(self):
+        other = LanBulbSimulator(label="Lamp", mac_addr="d0:73:d5:00:00:02", power=0)
+        self.addCleanup(other.close)
+
+        async def both():
+            return await asyncio.gather(
+                self.transport.get(self.device, GetPower, StatePower),
+                self.transport.get(
+                    other.device(self.transport.source_id), GetPower, StatePower
+                ),
+            )
+
+        mine, theirs = self.call(both())
+        self.assertEqual((mine.power_level, theirs.power_level), (65535, 0))
+
+    def test_retries_a_dropped_packet(self):
+        self.bulb.drop = 1
+        state = self.call(
+            self.transport.get(
+                self.device, GetPower, StatePower, timeout=0.2, attempts=2
+            )
+        )
+        self.assertEqual(state.power_level, 65535)
+        # both tries carried the same sequence number
+        self.assertEqual(len({m.seq_num for m in self.bulb.received}), 1)
+
+    def test_silent_device_raises_workflow_exception(self):
+        self.bulb.silent = True
+        with self.assertRaises(lifxlan.WorkflowException):
+            self.call(
+                self.transport.get(
+                    self.device, GetPower, StatePower, timeout=0.1, attempts=2
+                )
+            )
+        self.assertEqual(len(self.bulb.received), 2)
+
+
+class IsLanDeviceTest(unittest.TestCase):
+    def test_only_real_addressed_devices(self):
+        self.assertFalse(is_lan_device(DummyBulb(label="Dummy")))
+        self.assertFalse(is_lan_device(lifxlan.Group([])))
+        self.assertTrue(
+            is_lan_device(lifxlan.Light("d0:73:d5:00:00:01", "10.0.0.2", 1, 56700, 1))
+        )
+        self.assertFalse(
+            is_lan_device(lifxlan.Light("d0:73:d5:00:00:01", None, 1, 56700, 1))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -21,7 +21,6 @@ class FakeMaster(ttk.Frame):
         self.audio_interface = type(
             "A", (), {"initialized": False, "get_music_color": lambda *a: None}
         )()
-        self.bulb_interface = type("B", (), {"power_queue": {}, "color_queue": {}})()
 
 
 class TestZonePainting(unittest.TestCase):
@@ -0,0 +1,173 @@
+import itertools
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import lifxlan
+
+# Import the app's modules through its package, as it does, so each is loaded once
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from lifx_control_panel.utilities.multizone import (
+    SetExtendedColorZones,
+    ZoneStream,
+    message_cost,
+    supports_extended,
+)
+from lifx_control_panel.utilities.utils import Color
+from test.dummy_devices import MultiZoneDummy
+
+
+def frame(n, zones=8):
+    return [Color(n, 65535, 65535, 3500)] * zones
+
+
+def until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class ZoneStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.bulb = MultiZoneDummy(label="Beam", num_zones=8)
+        self.streams = []
+
+    def tearDown(self):
+        for stream in self.streams:
+            stream.stop()
+
+    def stream(self, **kwargs):
+        stream = ZoneStream(self.bulb, **kwargs)
+        self.streams.append(stream)
+        return stream
+
+    def test_first_frame_is_an_acked_keyframe_then_unacked(self):
+        stream = self.stream(rate=200, keyframe_interval=60).start()
+        stream.push(frame(1))
+        self.assertTrue(until(lambda: stream.sent == 1))
+        stream.push(frame(2))
+        self.assertTrue(until(lambda: stream.sent == 2))
+        self.assertEqual(self.bulb.acked_messages, [SetExtendedColorZones])
+        self.assertEqual(self.bulb.fired_messages, [SetExtendedColorZones])
+        self.assertEqual(self.bulb.get_color_zones(), frame(2))
+
+    def test_stale_frames_are_dropped_not_queued(self):
+        stream = self.stream(rate=200)
+        for n in range(5):
+            stream.push(frame(n))
+        stream.start()
+        self.assertTrue(until(lambda: stream.sent == 1))
+        self.assertEqual(stream.dropped, 4)
+        self.assertEqual(self.bulb.get_color_zones(), frame(4))
+
+    def test_frames_are_held_to_the_rate(self):
+        stream = self.stream(frames=map(frame, itertools.count()), rate=50).start()
+        time.sleep(0.3)
+        stream.stop()
+        # 50 a second for 0.3s, the first at once
+        self.assertLessEqual(stream.sent, 16)
+        self.assertGreaterEqual(stream.sent, 5)
+
+    def test_held_up_device_costs_the_generator_a_frame_per_frame_time(self):
+        pulled = []
+
+        def frames():
+            for n in itertools.count():
+                pulled.append(n)
+                yield frame(n)
+
+        self.bulb.req_with_ack = lambda *a, **kw: time.sleep(0.3)  # a slow keyframe
+        stream = self.stream(frames=frames(), rate=20).start()
+        time.sleep(0.2)
+        # Pulled once a frame time (50ms) while the keyframe waits, each replacing the last
+        self.assertLessEqual(len(pulled), 7)
+        self.assertGreaterEqual(stream.dropped, 1)
+        stream.stop()
+
+    def test_idle_stream_resends_the_last_frame_acked(self):
+        stream = self.stream(rate=200, keyframe_interval=0.05).start()
+        stream.push(frame(1))
+        self.assertTrue(until(lambda: stream.keyframes >= 3))
+        self.assertEqual(stream.sent, stream.keyframes)
+        self.assertEqual(self.bulb.fired_messages, [])
+
+    def test_missed_keyframe_is_retried_with_the_next_frame(self):
+        misses = []
+
+        def busy(*a, **kw):
+            misses.append(1)
+            raise lifxlan.WorkflowException("busy")
+
+        inner, self.bulb.req_with_ack = self.bulb.req_with_ack, busy
+        stream = self.stream(rate=200, keyframe_interval=60).start()
+        stream.push(frame(1))
+        self.assertTrue(until(lambda: stream.missed_keyframes >= 1))
+        self.bulb.req_with_ack = inner
+        stream.push(frame(2))
+        self.assertTrue(
+            until(lambda: SetExtendedColorZones in self.bulb.acked_messages)
+        )
+        self.assertEqual(self.bulb.get_color_zones(), frame(2))
+        self.assertEqual(self.bulb.fired_messages, [])
+
+    def test_unexpected_error_skips_the_frame_not_the_stream(self):
+        inner = self.bulb.req_with_ack
+
+        def broken(*a, **kw):
+            self.bulb.req_with_ack = inner
+            raise RuntimeError("transport closed")
+
+        self.bulb.req_with_ack = broken
+        stream = self.stream(rate=200, keyframe_interval=60).start()
+        with self.assertLogs("root", "ERROR"):
+            stream.push(frame(1))
+            self.assertTrue(until(lambda: self.bulb.req_with_ack is inner))
+            time.sleep(0.02)
+        stream.push(frame(2))
+        self.assertTrue(until(lambda: self.bulb.get_color_zones() == frame(2)))
+        self.assertTrue(stream._threads[0].is_alive())
+
+    def test_each_frame_asks_about_the_firmware_once(self):
+        asked = []
+
+        def firmware(*a, **kw):
+            asked.append(1)
+            raise lifxlan.WorkflowException("busy")
+
+        self.bulb.req_with_resp = firmware
+        with mock.patch(
+            "lifx_control_panel.utilities.multizone.supports_extended",
+            side_effect=supports_extended,
+        ) as probe:
+            stream = self.stream(rate=200, keyframe_interval=60).start()
+            stream.push(frame(1))
+            self.assertTrue(until(lambda: stream.sent == 1))
+            stream.push(frame(2))
+            self.assertTrue(until(lambda: stream.sent == 2))
+        self.assertEqual(probe.call_count, 2)
+        self.assertEqual(len(asked), 1)  # and the unanswered query isn't repeated
+
+    def test_stop_ends_the_threads(self):
+        stream = self.stream(frames=map(frame, itertools.count())).start()
+        stream.stop(timeout=2)
+        self.assertFalse(any(thread.is_alive() for thread in stream._threads))
+
+
+class MessageCostTest(unittest.TestCase):
+    def test_extended_strip_costs_one_message(self):
+        bulb = MultiZoneDummy(label="Beam", num_zones=8)
+        self.assertEqual(message_cost(bulb, [frame(n, 1)[0] for n in range(8)]), 1)
+
+    def test_legacy_strip_costs_a_message_per_run(self):
+        bulb = MultiZoneDummy(label="Old Z", num_zones=8, firmware=(2, 76))
+        self.assertEqual(message_cost(bulb, frame(1, 3) + frame(2, 5)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
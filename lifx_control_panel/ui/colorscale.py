@@ -1,8 +1,60 @@
+import base64
+import functools
+import io
 import logging
 import tkinter as tk
-from typing import List
 
-from ..utilities.utils import tuple2hex, hsv_to_rgb, kelvin_to_rgb
+import numpy as np
+from PIL import Image
+
+from ..utilities.colors import kelvin_to_rgb_array
+
+# Distinct gradients worth keeping: four per LightFrame, nearly all the same few sizes
+GRADIENT_CACHE_SIZE = 64
+
+
+def gradient_row(gradient, width, from_, to) -> np.ndarray:
+    """The colors of a gradient scale's columns, left to right, as a (width, 3) uint8
+    array. Each is what the per-column tuple2hex/kelvin_to_rgb/colorsys code drew."""
+    fraction = np.arange(width) / width
+    if gradient == "bw":
+        row = np.repeat(np.trunc(fraction * 255)[:, np.newaxis], 3, axis=1)
+    elif gradient == "wb":
+        row = np.repeat(np.trunc((1 - fraction) * 255)[:, np.newaxis], 3, axis=1)
+    elif gradient == "kelvin":
+        return kelvin_to_rgb_array(np.trunc((fraction * (to - from_)) + from_))
+    elif gradient == "hue":
+        # colorsys.hsv_to_rgb at full saturation and value, step for step
+        hue = (fraction * 360) / 360
+        sector = np.trunc(hue * 6.0)
+        rising = 1.0 - (1.0 - ((hue * 6.0) - sector))
+        falling = 1.0 - ((hue * 6.0) - sector)
+        one, zero = np.ones(width), np.zeros(width)
+        sector = sector.astype(np.intp) % 6
+        row = np.stack(
+            [
+                np.choose(sector, (one, falling, zero, zero, rising, one)),
+                np.choose(sector, (rising, one, one, falling, zero, zero)),
+                np.choose(sector, (zero, zero, rising, one, one, falling)),
+            ],
+            axis=1,
+        )
+        row = np.trunc(row * 255)
+    else:
+        raise ValueError(f"gradient value {gradient} not recognized")
+    return row.astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=GRADIENT_CACHE_SIZE)
+def gradient_data(gradient, width, height, from_, to) -> str:
+    """A width x height gradient, as base64 PNG for a PhotoImage's data option. Shared by
+    every ColorScale: a window of identical LightFrames draws each gradient once."""
+    row = gradient_row(gradient, width, from_, to)
+    buffer = io.BytesIO()
+    Image.fromarray(np.broadcast_to(row, (height, width, 3))).save(
+        buffer, format="PNG", compress_level=1
+    )
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
 
 
 class ColorScale(tk.Canvas):
@@ -74,46 +126,10 @@ class ColorScale(tk.Canvas):
         width = self.winfo_width()
         height = self.winfo_height()
 
-        self.gradient = tk.PhotoImage(master=self, width=width, height=height)
-
-        line: List[str] = []
-
-        def gradfunc(x_coord):
-            return line.append(tuple2hex((0, 0, 0)))
-
-        if self.color_grad == "bw":
-
-            def gradfunc(x_coord):
-                line.append(tuple2hex((int(float(x_coord) / width * 255),) * 3))
-
-        elif self.color_grad == "wb":
-
-            def gradfunc(x_coord):
-                line.append(tuple2hex((int((1 - (float(x_coord) / width)) * 255),) * 3))
-
-        elif self.color_grad == "kelvin":
-
-            def gradfunc(x_coord):
-                line.append(
-                    tuple2hex(
-                        kelvin_to_rgb(
-                            int(((float(x_coord) / width) * self.range) + self.min)
-                        )
-                    )
-                )
-
-        elif self.color_grad == "hue":
-
-            def gradfunc(x_coord):
-                line.append(tuple2hex(hsv_to_rgb(float(x_coord) / width * 360)))
-
-        else:
-            raise ValueError(f"gradient value {self.color_grad} not recognized")
-
-        for x_coord in range(width):
-            gradfunc(x_coord)
-        line: str = "{" + " ".join(line) + "}"
-        self.gradient.put(" ".join([line for _ in range(height)]))
+        self.gradient = tk.PhotoImage(
+            master=self,
+            data=gradient_data(self.color_grad, width, height, self.min, self.max),
+        )
         self.create_image(0, 0, anchor="nw", tags="gradient", image=self.gradient)
         self.lower("gradient")
 
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import base64
+import functools
+import io
+import math
 import tkinter
 from tkinter import ttk
+
+import numpy as np
 from PIL import Image as pImage
 
 import lifxlan
@@ -14,10 +20,92 @@ ICON_PADDING = 5
 LABEL_ROOM = 14  # vertical space under an icon for its (possibly wrapped) label
 HIGHLIGHT_SATURATION = 95
 COLOR_CODE = {"BULB_TOP": 11, "BACKGROUND": 15}
+# Rendered sprites kept per list: 11 brightness steps x a few colors x selected or not
+ICON_CACHE_SIZE = 256
+# Colors are bucketed before they key that cache, so a slow fade redraws from it rather than
+# rendering a sprite per frame: hue in 10 degree steps, saturation and brightness in tenths,
+# kelvin in 500K steps -- closer than that looks the same at icon size
+ICON_HUE_STEPS = 36
+ICON_LEVEL_STEPS = 10
+ICON_KELVIN_STEP = 500
+# Icons kept drawn past each edge of the visible strip, so a short scroll has them ready
+SCROLL_MARGIN = 2
+
+
+def quantize_hsbk(color):
+    """color snapped to the icon cache's buckets; see ICON_HUE_STEPS."""
+    hue, saturation, brightness, kelvin = color
+    hue_step = 65536 / ICON_HUE_STEPS
+    level_step = 65535 / ICON_LEVEL_STEPS
+    return (
+        round(round(hue / hue_step) * hue_step) % 65536,
+        round(round(saturation / level_step) * level_step),
+        round(round(brightness / level_step) * level_step),
+        round(kelvin / ICON_KELVIN_STEP) * ICON_KELVIN_STEP,
+    )
+
+
+class IconRenderer:
+    """Draws an icon's sprite for a given brightness step, color and selection.
+
+    The sprite's source PNG is a palette: gray values 0-10 are the brightness ticks lit
+    up to the bulb's brightness, BULB_TOP is always lit, and BACKGROUND turns
+    HIGHLIGHT_SATURATION when selected. Which pixel is which is worked out once, here, as
+    masks over the source, so drawing a state is a few NumPy assignments instead of a
+    Python test per pixel.
+    """
+
+    def __init__(self, source: pImage.Image):
+        self.base = np.array(source.convert("RGBA"))
+        rgb = self.base[:, :, :3].astype(np.int16)
+        opaque = self.base[:, :, 3] == 255
+        # The highest tick a pixel needs to be lit: BULB_TOP counts as below every tick, and
+        # anything transparent is never lit
+        ticks = np.where(rgb == COLOR_CODE["BULB_TOP"], -1, rgb).max(axis=2)
+        self.ticks = np.where(opaque, ticks, 256)
+        self.background = opaque & (rgb == COLOR_CODE["BACKGROUND"]).all(axis=2)
+
+    def render(self, level=None, rgb=None, selected=False) -> np.ndarray:
+        """The sprite as a (height, width, 4) RGBA array. level is the highest tick lit
+        (-1 for none, as when the bulb is off) and rgb the color to light them with; with
+        no level, the ticks are left as drawn."""
+        sprite = self.base.copy()
+        background = HIGHLIGHT_SATURATION if selected else COLOR_CODE["BACKGROUND"]
+        sprite[self.background, :3] = background
+        if level is not None:
+            sprite[self.ticks <= level, :3] = rgb
+        return sprite
+
+    def photo_data(self, level=None, rgb=None, selected=False) -> str:
+        """render() as base64 PNG, ready for a PhotoImage's data option."""
+        buffer = io.BytesIO()
+        pImage.fromarray(self.render(level, rgb, selected)).save(
+            buffer, format="PNG", compress_level=1
+        )
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class IconSlot:  # pylint: disable=too-few-public-methods
+    """One drawn icon on the canvas: a sprite, its image and label items, and which
+    device's icon it currently shows. Slots are recycled as the strip scrolls."""
+
+    def __init__(self, sprite, image, text):
+        self.sprite = sprite
+        self.image = image
+        self.text = text
+        self.label = None
+        self.state = None  # the (brightness step, color, selected) the sprite shows
 
 
 class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attributes
-    """Holds the dynamic icons for each Device and Group"""
+    """Holds the dynamic icons for each Device and Group.
+
+    Only icons in (or within SCROLL_MARGIN of) the visible part of the strip are drawn.
+    Every device has a place in the row and a remembered state, but sprites and canvas
+    items exist just for the icons on screen, and are handed to others as the strip
+    scrolls; an off-screen icon's update only records its new state. With 100+ devices,
+    memory and redraw time are those of the dozen or so icons that fit.
+    """
 
     def __init__(self, *args, is_group: bool = False, **kwargs):
         # Parameters
@@ -39,7 +127,7 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
         super().__init__(*args, width=window_width, height=canvas_height, **kwargs)
         self.scroll_x = 0
         self.scroll_y = 0
-        self.bulb_dict: dict[str, tuple[tkinter.PhotoImage, int, int]] = {}
+        self.bulb_dict: dict[str, lifxlan.Device | None] = {}  # in row order
         self.canvas = tkinter.Canvas(
             self,
             width=window_width,
@@ -54,9 +142,11 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
         h_scroll.pack(side=tkinter.BOTTOM, fill=tkinter.X)
         h_scroll.config(command=self.canvas.xview)
         self.canvas.config(width=window_width, height=canvas_height)
-        self.canvas.config(xscrollcommand=h_scroll.set)
+        self.h_scroll = h_scroll
+        # Called whenever the visible part of the strip changes: scrolls, resizes, and
+        # icons coming or going
+        self.canvas.config(xscrollcommand=self._on_view_change)
         self.canvas.pack(side=tkinter.LEFT, expand=True, fill=tkinter.BOTH)
-        self.current_icon_width = 0
         path = self.icon_path()
         source = pImage.open(path)
         if (
@@ -65,7 +155,14 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
             source = source.resize(
                 (source.width * self.scale, source.height * self.scale), pImage.NEAREST
             )
-        self.original_icon = source.load()
+        self.renderer = IconRenderer(source)
+        # Each slot keeps its own PhotoImage; what's cached is the data to fill it with
+        self._photo_data = functools.lru_cache(maxsize=ICON_CACHE_SIZE)(
+            self.renderer.photo_data
+        )
+        self._icon_states: dict[str, tuple] = {}  # label -> state its icon should show
+        self._slots: dict[str, IconSlot] = {}  # label -> slot drawing it, if on screen
+        self._free_slots: list[IconSlot] = []  # hidden, ready for the next icon to show
         self._current_icon = None
 
     @property
@@ -83,37 +180,23 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
 
     def draw_bulb_icon(self, bulb, label):
         """Given a bulb and a name, add the icon to the end of the row."""
-        # Make room on canvas
-        self.scroll_x += self.icon_width
-        self.canvas.configure(scrollregion=(0, 0, self.scroll_x, self.scroll_y))
-        # Build icon
-        path = self.icon_path()
-        sprite = tkinter.PhotoImage(file=path, master=self.master)
-        if self.scale > 1:  # integer nearest-neighbor zoom; preserves palette values
-            sprite = sprite.zoom(self.scale)
-        image = self.canvas.create_image(
-            (
-                self.current_icon_width + self.icon_width - self.icon_padding,
-                self.icon_height / 2 + 2 * self.icon_padding,
-            ),
-            image=sprite,
-            anchor=tkinter.SE,
-            tags=[label],
-        )
-        text = self.canvas.create_text(
-            self.current_icon_width + self.icon_width / 2,
-            self.icon_height / 2 + 2 * self.icon_padding,
-            text=label,
-            width=self.icon_width
-            - self.icon_padding,  # wrap instead of running into the next icon
-            justify=tkinter.CENTER,
-            anchor=tkinter.N,
-            tags=[label],
-        )
-        self.bulb_dict[label] = (sprite, image, text)
+        self.bulb_dict[label] = bulb
+        self._icon_states[label] = (None, None, False)  # the icon as drawn
         self.update_icon(bulb)
-        # update sizing info
-        self.current_icon_width += self.icon_width
+        self._resize_row()
+
+    def remove_bulb_icon(self, label):
+        """Remove label's icon and close the gap it leaves in the row."""
+        del self.bulb_dict[label]
+        del self._icon_states[label]
+        if label in self._slots:
+            self._release(self._slots.pop(label))
+        for index, shown in enumerate(self.bulb_dict):  # later icons move left
+            if shown in self._slots:
+                self._place(self._slots[shown], index)
+        if self._current_icon == label:
+            self._current_icon = None
+        self._resize_row()
 
     def update_icon(self, bulb: lifxlan.Device):
         """If changes have been detected in the interface, update the bulb state."""
@@ -124,7 +207,7 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
             bulb_color = self.master.bulb_interface.color_cache[bulb.label]
             bulb_power = self.master.bulb_interface.power_cache[bulb.label]
             bulb_brightness = bulb_color[2]
-            sprite, image, _ = self.bulb_dict[bulb.label]
+            selected = self._icon_states[bulb.label][2]
         except (TypeError, KeyError):
             # TypeError: first run gives None; KeyError: bulb missed during a rescan
             # (WorkflowException in set_device_list) so the new cache lacks its label.
@@ -132,76 +215,101 @@ class BulbIconList(tkinter.Frame):  # pylint: disable=too-many-instance-attribut
             return
         # Calculate what number, 0-11, corresponds to current brightness
         brightness_scale = (int((bulb_brightness / 65535) * 10) * (bulb_power > 0)) - 1
-        color_string = ""
-        for y in range(sprite.height()):  # pylint: disable=invalid-name
-            color_string += "{"
-            for x in range(sprite.width()):  # pylint: disable=invalid-name
-                # If the tick is < brightness, color it. Otherwise, set it back to the default color
-                icon_rgb = self.original_icon[x, y][:3]
-                if (
-                    all(
-                        (v <= brightness_scale or v == COLOR_CODE["BULB_TOP"])
-                        for v in icon_rgb
-                    )
-                    and self.original_icon[x, y][3] == 255
-                ):
-                    color = utils.hsbk_to_rgb(bulb_color)
-                elif (
-                    all(
-                        v in (COLOR_CODE["BACKGROUND"], HIGHLIGHT_SATURATION)
-                        for v in icon_rgb
-                    )
-                    and self.original_icon[x, y][3] == 255
-                ):
-                    color = sprite.get(x, y)[:3]
-                else:
-                    color = icon_rgb
-                color_string += utils.tuple2hex(color) + " "
-            color_string += "} "
-        # Write the final colorstring to the sprite, then update the GUI
-        sprite.put(color_string, (0, 0, sprite.height(), sprite.width()))
-        self.canvas.itemconfig(image, image=sprite)
+        self._show(
+            bulb.label,
+            (
+                brightness_scale,
+                utils.hsbk_to_rgb(quantize_hsbk(bulb_color)),
+                selected,
+            ),
+        )
+
+    def _show(self, label, state):
+        """Set the (brightness step, color, selected) label's icon shows. Drawn now if the
+        icon is on screen; otherwise when it scrolls into view."""
+        self._icon_states[label] = state
+        slot = self._slots.get(label)
+        if slot is not None:
+            self._fill(slot)
+
+    def _fill(self, slot):
+        """Bring slot's sprite up to date with its icon's state, from the cache."""
+        state = self._icon_states[slot.label]
+        if slot.state == state:
+            return  # polled every frame; most of the time nothing has changed
+        slot.sprite.configure(data=self._photo_data(*state))
+        slot.state = state
 
     def set_selected_bulb(self, light_name):
         """Highlight the newly selected bulb icon when changed."""
-        if self._current_icon:
+        if self._current_icon and self._current_icon != light_name:
             self.clear_selected()
-        sprite, image, _ = self.bulb_dict[light_name]
-        color_string = ""
-        for y in range(sprite.height()):  # pylint: disable=invalid-name
-            color_string += "{"
-            for x in range(sprite.width()):  # pylint: disable=invalid-name
-                icon_rgb = sprite.get(x, y)[:3]
-                if (
-                    all(v == COLOR_CODE["BACKGROUND"] for v in icon_rgb)
-                    and self.original_icon[x, y][3] == 255
-                ):
-                    color = (HIGHLIGHT_SATURATION,) * 3
-                else:
-                    color = icon_rgb
-                color_string += utils.tuple2hex(color) + " "
-            color_string += "} "
-        sprite.put(color_string, (0, 0, sprite.height(), sprite.width()))
-        self.canvas.itemconfig(image, image=sprite)
+        level, rgb, _ = self._icon_states[light_name]
+        self._show(light_name, (level, rgb, True))
         self._current_icon = light_name
 
     def clear_selected(self):
         """Reset background to original state (from highlighted)."""
-        sprite, image, _ = self.bulb_dict[self._current_icon]
-        color_string = ""
-        for y in range(sprite.height()):  # pylint: disable=invalid-name
-            color_string += "{"
-            for x in range(sprite.width()):  # pylint: disable=invalid-name
-                icon_rgb = sprite.get(x, y)[:3]
-                if (
-                    all(v == HIGHLIGHT_SATURATION for v in icon_rgb)
-                    and self.original_icon[x, y][3] == 255
-                ):
-                    color = (COLOR_CODE["BACKGROUND"],) * 3
-                else:
-                    color = icon_rgb
-                color_string += utils.tuple2hex(color) + " "
-            color_string += "} "
-        sprite.put(color_string, (0, 0, sprite.height(), sprite.width()))
-        self.canvas.itemconfig(image, image=sprite)
+        level, rgb, _ = self._icon_states[self._current_icon]
+        self._show(self._current_icon, (level, rgb, False))
         self._current_icon = None
+
+    def _resize_row(self):
+        # Changing the scrollregion calls _on_view_change, which draws what's now visible
+        self.scroll_x = len(self.bulb_dict) * self.icon_width
+        self.canvas.configure(scrollregion=(0, 0, self.scroll_x, self.scroll_y))
+
+    def _on_view_change(self, first, last):
+        self.h_scroll.set(first, last)
+        self._draw_visible(float(first), float(last))
+
+    def _draw_visible(self, first, last):
+        """Give a slot to every icon between fractions first and last of the row (give or
+        take SCROLL_MARGIN icons), and take them back from every icon outside it."""
+        labels = list(self.bulb_dict)
+        start = max(0, math.floor(first * len(labels)) - SCROLL_MARGIN)
+        end = min(len(labels), math.ceil(last * len(labels)) + SCROLL_MARGIN)
+        visible = set(labels[start:end])
+        for label in [label for label in self._slots if label not in visible]:
+            self._release(self._slots.pop(label))
+        for index in range(start, end):
+            label = labels[index]
+            if label in self._slots:
+                continue
+            slot = self._free_slots.pop() if self._free_slots else self._new_slot()
+            slot.label = label
+            self._slots[label] = slot
+            self._place(slot, index)
+            self.canvas.itemconfigure(slot.text, text=label)
+            for item in (slot.image, slot.text):
+                # on_bulb_canvas_click reads the label from the clicked item's tag
+                self.canvas.itemconfigure(item, tags=[label], state=tkinter.NORMAL)
+            self._fill(slot)
+
+    def _new_slot(self) -> IconSlot:
+        sprite = tkinter.PhotoImage(data=self._photo_data(), master=self.master)
+        image = self.canvas.create_image(0, 0, image=sprite, anchor=tkinter.SE)
+        # Wrapped to the icon's width instead of running into the next icon
+        text = self.canvas.create_text(
+            0,
+            0,
+            width=self.icon_width - self.icon_padding,
+            justify=tkinter.CENTER,
+            anchor=tkinter.N,
+        )
+        slot = IconSlot(sprite, image, text)
+        slot.state = (None, None, False)  # what _photo_data() with no state draws
+        return slot
+
+    def _place(self, slot, index):
+        """Move slot's items to the index-th place in the row."""
+        left = index * self.icon_width
+        top = self.icon_height / 2 + 2 * self.icon_padding
+        self.canvas.coords(slot.image, left + self.icon_width - self.icon_padding, top)
+        self.canvas.coords(slot.text, left + self.icon_width / 2, top)
+
+    def _release(self, slot):
+        for item in (slot.image, slot.text):
+            self.canvas.itemconfigure(item, tags=[], state=tkinter.HIDDEN)
+        slot.label = None
+        self._free_slots.append(slot)
@@ -44,8 +44,8 @@ from tkinter.ttk import (
 from tkinter.colorchooser import askcolor
 
 import mss
-from lifxlan.utils import RGBtoHSBK
 
+from ..utilities.colors import rgb_to_hsbk
 from ..utilities.keypress import KeybindManager
 from ..utilities.utils import (
     resource_path,
@@ -61,6 +61,14 @@ config.read([resource_path("default.ini"), "config.ini"])
 KEYBIND_ACTIONS = ("Toggle Power", "Brightness Up", "Brightness Down")
 
 
+def default_colors():
+    """The preset colors every LightFrame offers. Read from the class, as settings can open
+    before any frame is built. Imported here: frames imports this module for config."""
+    from ..frames import LightFrame  # pylint: disable=import-outside-toplevel
+
+    return LightFrame.default_colors
+
+
 # boilerplate code from http://effbot.org/tkinterbook/tkinter-dialog-windows.htm
 class Dialog(Toplevel):
     """Template for dialogs that include an Ok and Cancel button, and return validated user input data."""
@@ -361,9 +369,7 @@ class SettingsDisplay(Dialog):
             self.keybind_color_selection,
             "Color",
             *KEYBIND_ACTIONS,
-            *self.root_window.frame_map[
-                self.keybind_bulb_selection.get()
-            ].default_colors,
+            *default_colors(),
             *(
                 [*config["PresetColors"].keys()]
                 if any(config["PresetColors"].keys())
@@ -450,17 +456,14 @@ class SettingsDisplay(Dialog):
         """Present user with color palette dialog and return color in HSBK"""
         color = askcolor()[0]
         if color:
-            # RGBtoHBSK sometimes returns >65535, so we have to clamp
-            hsbk = [min(c, 65535) for c in RGBtoHSBK(color)]
+            hsbk = list(rgb_to_hsbk(color))
             config["PresetColors"][self.preset_color_name.get()] = str(hsbk)
 
     def register_keybinding(self, bulb: str, keys: str, color: str):
         """Get the keybind from the input box and pass the color off to the root window."""
         if color not in KEYBIND_ACTIONS:
             try:
-                color = self.root_window.frame_map[
-                    self.keybind_bulb_selection.get()
-                ].default_colors[color]
+                color = default_colors()[color]
             except KeyError:  # must be using a custom color
                 color = str2list(config["PresetColors"][color], int)
         self.root_window.save_keybind(bulb, keys, color)
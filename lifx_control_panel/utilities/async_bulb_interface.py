@@ -1,28 +1,64 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import concurrent.futures
 import logging
 import queue
 import threading
-from typing import List, Union
+import time
+from typing import Dict, List
 
 import lifxlan
+from lifxlan.msgtypes import (
+    LightGet,
+    LightSetColor,
+    LightSetPower,
+    LightState,
+    LightStatePower,
+    SetPower,
+    StatePower,
+)
+
+from .. import STALE_STATE_MS
+from .scheduling import HeartbeatScheduler
+from .transport import is_lan_device, shared_transport
+
+MIN_WAIT = 0.05  # seconds; floor on the scheduler loop's sleep
 
 
 class AsyncBulbInterface(threading.Thread):
-    """Asynchronous networking layer between LIFX devices and the GUI."""
+    """Asynchronous networking layer between LIFX devices and the GUI.
+
+    LAN devices are mostly *listened to* rather than polled: every State* packet the transport
+    hears (a reply to anyone's Get, a broadcast after another app changed the bulb) and every
+    acknowledged Set of our own updates the caches as it arrives. A Set overheard from another
+    app gets the device polled at once; otherwise a device is only polled once it has been
+    silent for stale_ms.
 
-    def __init__(self, event, heartbeat_ms):
+    Polls go through a HeartbeatScheduler: the device on screen (see set_focus) is polled
+    every heartbeat, unresponsive ones back off, and device_stats() says why a bulb is slow.
+
+    Whatever changes a cache is also put on the one `changes` queue, for the GUI to pick up
+    with drain_changes: one queue to check per tick, however many devices there are.
+    """
+
+    def __init__(self, event, heartbeat_ms, transport=None, stale_ms=STALE_STATE_MS):
         threading.Thread.__init__(self)
 
         self.stopped = event
 
         self.hb_rate = heartbeat_ms
+        self.stale_ms = stale_ms
+        self._transport = transport
+        self._listening = False
 
         self.device_list = []
-        self.color_queue = {}
         self.color_cache = {}
-        self.power_queue = {}
         self.power_cache = {}
+        # (label, "power" or "color", new value), oldest first
+        self.changes = queue.Queue()
+        self.devices_by_mac = {}
+        self.devices_by_label = {}
+        self.scheduler = HeartbeatScheduler(heartbeat_ms / 1000)
 
         self.logger = logging.getLogger("root")
 
@@ -33,49 +69,191 @@ class AsyncBulbInterface(threading.Thread):
         """Set internet device list to passed list of LIFX devices."""
         for dev in device_list:
             try:
-                label = dev.label or dev.get_label()  # cached by scan_for_lights' prefetch
-                self.color_queue[label] = queue.Queue()
-                # Multizone devices are skipped by query_device below, so their cache entry
+                if not dev.label:  # usually cached by scan_for_lights' prefetch
+                    dev.get_label()  # caches .label
+                # query_device ignores a multizone device's color, so its cache entry
                 # is never read -- seeding it cost ~11 round-trips per strip for nothing.
                 # (.color would be the per-zone list on a strip, not a single color.)
                 color = None if hasattr(dev, "get_color_zones") else getattr(dev, "color", None)
                 self.color_cache[dev.label] = color
-                self.power_queue[dev.label] = queue.Queue()
                 try:
                     self.power_cache[dev.label] = dev.power_level or dev.get_power()
                 except Exception as e:
                     self.logger.error(e)
                     self.power_cache[dev.label] = 0
                 self.device_list.append(dev)
+                self.devices_by_mac[dev.mac_addr] = dev
+                self.devices_by_label[dev.label] = dev
+                if is_lan_device(dev):
+                    # Added after run() started too (discovery), so listen from the first one
+                    self._listen()
+                # Nothing overhears a device the transport can't address, so it keeps the
+                # old every-heartbeat cadence
+                interval = self.stale_ms if is_lan_device(dev) else self.hb_rate
+                self.scheduler.add(dev.label, interval / 1000)
             except lifxlan.WorkflowException as exc:
                 self.logger.warning(
                     "Error when communicating with LIFX device: %s", exc
                 )
 
+    def _listen(self):
+        """Have the transport feed on_packet, once; polls of LAN devices rely on it."""
+        if not self._listening:
+            self.transport.add_listener(self.on_packet)
+            self._listening = True
+
+    def remove_device(self, dev):
+        """Stop polling dev and forget its state. Safe while the heartbeat is running."""
+        label = dev.label
+        self.scheduler.remove(label)
+        if dev in self.device_list:
+            self.device_list.remove(dev)
+        self.devices_by_mac.pop(dev.mac_addr, None)
+        self.devices_by_label.pop(label, None)
+        self.color_cache.pop(label, None)
+        self.power_cache.pop(label, None)
+
+    @property
+    def transport(self):
+        """The LAN transport, only opened once there's a real device to talk to."""
+        if self._transport is None:
+            self._transport = shared_transport()
+        return self._transport
+
+    def _update_power(self, label, pwr):
+        # A poll or packet can land after remove_device: defaulting to the new value drops
+        # its update, where indexing would KeyError the heartbeat or the transport loop
+        if pwr != self.power_cache.get(label, pwr):
+            self.power_cache[label] = pwr
+            self.changes.put((label, "power", pwr))
+
+    def _update_color(self, label, clr):
+        if clr != self.color_cache.get(label, clr):  # see _update_power
+            self.color_cache[label] = clr
+            self.changes.put((label, "color", clr))
+
+    def drain_changes(self) -> Dict[str, Dict[str, object]]:
+        """Everything that changed since the last call, as {label: {"power"/"color": newest
+        value}}: a device that changed twice shows up once, with where it ended up."""
+        changed = {}
+        while True:
+            try:
+                label, kind, value = self.changes.get_nowait()
+            except queue.Empty:
+                return changed
+            changed.setdefault(label, {})[kind] = value
+
+    def set_focus(self, label):
+        """label is the device on screen: poll it every heartbeat, starting now."""
+        self.scheduler.set_focus(label)
+
+    def device_stats(self):
+        """Per-device RTT, loss, backoff and time to next poll; see HeartbeatScheduler.snapshot."""
+        return self.scheduler.snapshot()
+
     def query_device(self, target):
-        """Check if target has new state. If it does, push it to the queue and cache the value."""
+        """Check if target has new state. If it does, push it to the queue and cache the value.
+
+        One LightGet (101) per tick: its LightState reply carries power as well as color, and
+        lifxlan's get_color caches power_level off that same packet."""
+        start = time.monotonic()
         try:
-            pwr = target.get_power()
-            if pwr != self.power_cache[target.label]:
-                self.power_queue[target.label].put(pwr)
-                self.power_cache[target.label] = pwr
-            # Skip color polling for multizone strips: get_color() reads back black (no single
-            # aggregate color) and stomps the sliders, while get_color_zones() is ~10 round-trips
+            color = target.get_color()
+            self._update_power(target.label, target.power_level)
+            # Ignore the color of multizone strips: it reads back black (no single aggregate
+            # color) and would stomp the sliders, while get_color_zones() is ~10 round-trips
             # per tick that saturate a lossy Beam and starve the paint packets. The sliders are
             # the user's paint input here, not a device mirror, so leave them alone.
-            if hasattr(target, "get_color_zones"):
-                return
-            clr = target.get_color()
-            if clr != self.color_cache[target.label]:
-                self.color_queue[target.label].put(clr)
-                self.color_cache[target.label] = clr
+            if not hasattr(target, "get_color_zones"):
+                self._update_color(target.label, color)
+        except lifxlan.WorkflowException:
+            self._poll_failed(target.label)
+        except Exception:  # pylint: disable=broad-except
+            # Anything else would leave the poll in flight and the device never polled again
+            self.logger.exception("Polling %s failed", target.label)
+            self._poll_failed(target.label)
+        else:
+            self.scheduler.completed(target.label, time.monotonic() - start)
+
+    def on_packet(self, mac_addr, message, acked=False):
+        """Transport listener: fold any state a device reported, or a Set of ours it acked,
+        into the caches. Anyone else's Set on the wire may never have landed, so it only
+        gets the device polled."""
+        target = self.devices_by_mac.get(mac_addr)
+        if target is None:
+            return
+        label = target.label
+        if isinstance(message, (SetPower, LightSetPower, LightSetColor)) and not acked:
+            self.scheduler.poll_soon(label)
+            return
+        if isinstance(message, LightState):
+            self._update_power(label, message.power_level)
+            color = message.color
+        elif isinstance(
+            message, (StatePower, LightStatePower, SetPower, LightSetPower)
+        ):
+            self._update_power(label, message.power_level)
+            color = None
+        elif isinstance(message, LightSetColor):
+            color = message.color
+        else:
+            return
+        # A strip's single color reads back black; see query_device. Its power is still good.
+        if color is not None and not hasattr(target, "get_color_zones"):
+            self._update_color(label, tuple(color))
+        self.scheduler.heard(label)
+
+    async def query_device_async(self, target):
+        """query_device over the shared transport. The replies reach the caches through
+        on_packet, like any other state the transport hears."""
+        start = time.monotonic()
+        try:
+            await self.transport.get(target, LightGet, LightState)
         except lifxlan.WorkflowException:
-            pass
+            self._poll_failed(target.label)
+        except asyncio.CancelledError:
+            self._poll_failed(target.label)
+            raise
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Polling %s failed", target.label)
+            self._poll_failed(target.label)
+        else:
+            self.scheduler.completed(target.label, time.monotonic() - start)
+
+    def _poll_failed(self, label):
+        self.scheduler.failed(label)
+        stats = self.scheduler.stats.get(label)
+        if stats is not None and stats.failures > 1:
+            self.logger.debug(
+                "%s missed %d polls in a row; next in %.0fs",
+                label,
+                stats.failures,
+                self.scheduler.interval(label),
+            )
 
     def run(self):
-        """Continuous loop that has a thread query each device every HEARTBEAT ms."""
+        """Poll whichever devices the scheduler says are due, until stopped.
+
+        LAN devices are polled as coroutines on the transport's event loop; devices it can't
+        address (test dummies) take a pool thread each. Either way a device has at most one
+        poll outstanding, so a dead bulb holds one worker, not one per tick."""
         with concurrent.futures.ThreadPoolExecutor(
             max_workers=max(1, len(self.device_list))
         ) as executor:
-            while not self.stopped.wait(self.hb_rate / 1000):
-                executor.map(self.query_device, self.device_list)
+            while True:
+                next_due = self.scheduler.next_due_in()
+                wait = self.hb_rate / 1000 if next_due is None else next_due
+                # Wake at least every heartbeat, so a new focus isn't left waiting long
+                if self.stopped.wait(min(max(wait, MIN_WAIT), self.hb_rate / 1000)):
+                    break
+                for label in self.scheduler.pop_due():
+                    dev = self.devices_by_label.get(label)
+                    if dev is None:  # removed since pop_due
+                        continue
+                    if is_lan_device(dev):
+                        self.transport.submit(self.query_device_async(dev))
+                    else:
+                        executor.submit(self.query_device, dev)
+        if self._listening:
+            self.transport.remove_listener(self.on_packet)
+            self._listening = False
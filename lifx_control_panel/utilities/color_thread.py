@@ -10,15 +10,32 @@ import threading
 from typing import List, Tuple
 import time
 
-import mss
 from PIL import Image
-from lifxlan import utils
-
+from lifxlan.msgtypes import LightSetColor
+
+from . import screen
+from .colors import rgb_to_hsbk, rgb_to_hsbk_array
+from .multizone import ZoneStream, set_zone_colors
+from .scheduling import SendBudget
+from .transport import is_lan_device, shared_transport
+from .screen import TIMINGS
 from .utils import str2list, Color
 from ..ui.settings import config
 
 from lifx_control_panel.utilities.utils import hsv_to_rgb
 
+# Continuous effects: a bulb absorbs about 20 messages a second, and the heartbeat and any
+# other frame share that budget
+TARGET_FPS = 15
+# hsbk_delta below which a frame isn't sent: about a 1% step in brightness
+CHANGE_THRESHOLD = 0.01
+REFRESH_INTERVAL = 2.0  # seconds; an unchanged color is still resent this often
+# Messages a second a group effect may send across all its members (one per member per frame)
+GROUP_SEND_BUDGET = 100
+KELVIN_SPAN = 9000 - 1500  # the widest white range of any LIFX product
+# Screen colors whose brightest channel is below this are shown unsaturated
+DARK_CUTOFF = 10  # ponytail: fixed threshold; make configurable if it clips dim scenes
+
 
 def get_monitor_bounds(func):
     """Returns the rectangular coordinates of the desired Avg. Screen area. Can pass a function to find the result
@@ -28,29 +45,21 @@ def get_monitor_bounds(func):
 
 def get_screen_as_image():
     """Grabs the entire primary screen as an image"""
-    with mss.mss() as sct:
-        monitor = sct.monitors[0]
-        bbox = (
-            monitor["left"],
-            monitor["top"],
-            monitor["left"] + monitor["width"],
-            monitor["top"] + monitor["height"],
-        )
-        sct_img = sct.grab(bbox)
-        return Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+    capture = screen.thread_capture()
+    sct_img = capture.grab_shot(capture.monitors[0])
+    return Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
 
 
 def get_rect_as_image(bounds: Tuple[int, int, int, int]):
     """Grabs a rectangular area of the primary screen as an image"""
-    with mss.mss() as sct:
-        monitor = {
-            "left": bounds[0],
-            "top": bounds[1],
-            "width": bounds[2],
-            "height": bounds[3],
-        }
-        sct_img = sct.grab(monitor)
-        return Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
+    monitor = {
+        "left": bounds[0],
+        "top": bounds[1],
+        "width": bounds[2],
+        "height": bounds[3],
+    }
+    sct_img = screen.thread_capture().grab_shot(monitor)
+    return Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
 
 
 def normalize_rectangles(rects: List[Tuple[int, int, int, int]]):
@@ -80,9 +89,7 @@ class ColorCycle:
             self.pos = (self.pos + 1) % 360
             self.cycle_color = hsv_to_rgb(self.pos, 1, self.initial_color[2] / 65535)
             self.last_change = time.time()
-        return list(
-            utils.RGBtoHSBK(self.cycle_color, temperature=self.initial_color[3])
-        )
+        return list(rgb_to_hsbk(self.cycle_color, temperature=self.initial_color[3]))
 
     def __call__(self, initial_color):
         self.initial_color = initial_color
@@ -92,52 +99,75 @@ class ColorCycle:
         return "ColorCycle"
 
 
+def hsbk_delta(color, other) -> float:
+    """How different two HSBK colors look, from 0 (identical) to 1.
+
+    Each component only counts as far as it's visible: hue as far as both colors are
+    saturated and lit, saturation and kelvin as far as they're lit (kelvin only while
+    unsaturated). The biggest of those is the difference."""
+    hue = abs(color[0] - other[0])
+    hue = min(hue, 65536 - hue) / 32768  # hue wraps around
+    saturation = abs(color[1] - other[1]) / 65535
+    brightness = abs(color[2] - other[2]) / 65535
+    kelvin = abs(color[3] - other[3]) / KELVIN_SPAN
+    lit = max(color[2], other[2]) / 65535
+    saturated = min(color[1], other[1]) / 65535
+    return max(
+        hue * saturated * lit,
+        saturation * lit,
+        brightness,
+        kelvin * (1 - saturated) * lit,
+    )
+
+
 def _screen_rgb_to_hsbk(rgb, temperature):
-    """Convert a captured screen pixel to HSBK, desaturating near-black pixels.
+    """Convert a captured screen pixel to HSBK, desaturating near-black pixels; see
+    colors.rgb_to_hsbk."""
+    return list(rgb_to_hsbk(rgb, temperature, dark_cutoff=DARK_CUTOFF))
 
-    RGBtoHSBK derives hue/saturation from (cmax-cmin)/cmax, so a noise pixel like
-    (1, 0, 1) comes out fully-saturated magenta. Treat anything that dark as black.
-    """
-    hue, saturation, brightness, kelvin = utils.RGBtoHSBK(rgb, temperature=temperature)
-    if (
-        max(rgb) < 10
-    ):  # ponytail: fixed threshold; make configurable if it clips dim scenes
-        saturation = 0
-    return [hue, saturation, brightness, kelvin]
+
+def grab_screen_array(monitor: str):
+    """Capture the area described by monitor ("full", or "[left, top, width, height]") as a
+    BGRA NumPy array; see screen.as_array.
+
+    Every effect following the screen shares one capture per frame and monitor; see
+    screen.SharedFrames. One frame old at targetfps still counts as current."""
+    fps = config["AverageColor"].getfloat("targetfps", fallback=TARGET_FPS)
+    with TIMINGS.timed("capture"):
+        if "full" in monitor:
+            # closed when the ColorThreadRunner's thread ends
+            region = screen.thread_capture().monitors[0]
+        else:
+            left, top, width, height = str2list(monitor, int)
+            region = {"left": left, "top": top, "width": width, "height": height}
+        return screen.SHARED_FRAMES.grab(region, max_age=1 / fps if fps > 0 else 0)
 
 
 def avg_screen_color(initial_color, func_bounds=lambda: None):
     """Capture an image of the monitor defined by func_bounds, then get the average color of the image in HSBK"""
-    monitor = get_monitor_bounds(func_bounds)
-    if "full" in monitor:
-        screenshot = get_screen_as_image()
-    else:
-        screenshot = get_rect_as_image(str2list(monitor, int))
-    # Resizing the image to 1x1 pixel will give us the average for the whole image (via HAMMING interpolation)
-    color = screenshot.resize((1, 1), Image.HAMMING).getpixel((0, 0))
+    bgra = grab_screen_array(get_monitor_bounds(func_bounds))
+    with TIMINGS.timed("average"):
+        color = screen.mean_rgb(bgra)
     return _screen_rgb_to_hsbk(color, initial_color[3])
 
 
 def dominant_screen_color(initial_color, func_bounds=lambda: None):
     """
-    Gets the dominant color of the screen defined by func_bounds
-    https://stackoverflow.com/questions/50899692/most-dominant-color-in-rgb-image-opencv-numpy-python
+    Gets the dominant color of the screen defined by func_bounds; see screen.dominant_rgb
     """
-    monitor = get_monitor_bounds(func_bounds)
-    if "full" in monitor:
-        screenshot = get_screen_as_image()
-    else:
-        screenshot = get_rect_as_image(str2list(monitor, int))
-
-    downscale_width, downscale_height = screenshot.width // 4, screenshot.height // 4
-    screenshot = screenshot.resize((downscale_width, downscale_height), Image.HAMMING)
+    bgra = grab_screen_array(get_monitor_bounds(func_bounds))
+    with TIMINGS.timed("dominant"):
+        color = screen.dominant_rgb(bgra)
+    return _screen_rgb_to_hsbk(color, initial_color[3])
 
-    color = max(
-        screenshot.getcolors(downscale_width * downscale_height),
-        key=lambda count_pixel: count_pixel[0],
-    )[1]
 
-    return _screen_rgb_to_hsbk(color, initial_color[3])
+def zone_screen_colors(initial_color, func_bounds=lambda: None, zones=1):
+    """The screen defined by func_bounds cut into `zones` columns, left to right, each
+    averaged to an HSBK color; see screen.zone_rgbs"""
+    bgra = grab_screen_array(get_monitor_bounds(func_bounds))
+    with TIMINGS.timed("zones"):
+        colors = screen.zone_rgbs(bgra, zones)
+    return rgb_to_hsbk_array(colors, initial_color[3], dark_cutoff=DARK_CUTOFF).tolist()
 
 
 class ColorThread(threading.Thread):
@@ -155,6 +185,11 @@ class ColorThread(threading.Thread):
         """Check if thread has been stopped"""
         return self._stop.isSet()
 
+    def wait(self, timeout):
+        """Sleep for timeout seconds, or until the thread is stopped"""
+        if timeout > 0:
+            self._stop.wait(timeout)
+
 
 class ColorThreadRunner:
     """Manages an asynchronous color-change with a Device. Can be run continuously, stopped and started."""
@@ -180,30 +215,79 @@ class ColorThreadRunner:
         )
 
     def match_color(self, bulb):
-        """ColorThread target which calls the 'change_color' function on the bulb."""
+        """ColorThread target which calls the 'change_color' function on the bulb.
+
+        A continuous effect runs at most get_target_fps() frames a second, and a frame only
+        goes out if it looks different from the last one sent (see should_send); a static
+        desktop used to cost a packet per loop, as fast as capture allowed."""
         self.logger.debug("Starting color match.")
         self.prev_color = (
             self.parent.get_color_values_hsbk()
         )  # coupling to LightFrame from gui.py here
-        while not self.thread.stopped():
-            try:
-                color = list(
-                    self.color_function(initial_color=self.prev_color, **self.kwargs)
-                )
-                color[2] = self.limit_brightness(
-                    color[2] + self.get_brightness_offset()
-                )
-                bulb.set_color(
-                    color, duration=self.get_duration() * 1000, rapid=self.continuous
-                )
-                self.prev_color = color
-            except OSError:
-                # This is dirty, but we really don't care, just keep going
-                self.logger.info("Hit an os error")
-                continue
-            if not self.continuous:
-                self.stop()
-        self.logger.debug("Color match finished.")
+        fps = self.get_target_fps()
+        frame_time = 1 / fps if fps > 0 else 0
+        self._sent_color, self._sent_at = None, 0.0
+        frames = sent = 0
+        try:
+            while not self.thread.stopped():
+                started = time.monotonic()
+                try:
+                    color = self.next_color()
+                    frames += 1
+                    if not self.continuous or self.should_send(color, started):
+                        self.send(bulb, color)
+                        self._sent_color, self._sent_at = color, started
+                        sent += 1
+                except OSError:
+                    # This is dirty, but we really don't care, just keep going
+                    self.logger.info("Hit an os error")
+                else:
+                    if not self.continuous:
+                        self.stop()
+                # Returns at once on stop(), so a slow frame rate doesn't delay stopping
+                self.thread.wait(frame_time - (time.monotonic() - started))
+        finally:
+            # The screen functions keep one capture session per thread; this is its end
+            screen.close_thread_capture()
+        self.logger.debug(
+            "Color match finished. Sent %d of %d frames. Frame timings: %s",
+            sent,
+            frames,
+            TIMINGS.summary(),
+        )
+
+    def next_color(self):
+        """The effect's next color, with the configured brightness offset and limits."""
+        color = list(self.color_function(initial_color=self.prev_color, **self.kwargs))
+        color[2] = self.limit_brightness(color[2] + self.get_brightness_offset())
+        self.prev_color = color
+        return color
+
+    def send(self, bulb, color):
+        duration = self.get_duration() * 1000
+        if not is_lan_device(bulb):
+            bulb.set_color(color, duration=duration, rapid=self.continuous)
+            return
+        # Over the shared socket: lifxlan opens a socket per call, and this runs every frame
+        transport = shared_transport()
+        payload = {"color": color, "duration": duration}
+        if self.continuous:
+            transport.submit_and_forget(transport.set(bulb, LightSetColor, payload))
+        else:
+            transport.submit(transport.ack(bulb, LightSetColor, payload)).result()
+
+    @staticmethod
+    def difference(color, other):
+        return hsbk_delta(color, other)
+
+    def should_send(self, color, now):
+        """Whether color differs visibly from the last color sent. Rapid sends aren't acked,
+        so the last one is repeated every REFRESH_INTERVAL in case it was lost."""
+        return (
+            self._sent_color is None
+            or now - self._sent_at >= REFRESH_INTERVAL
+            or self.difference(color, self._sent_color) >= self.get_change_threshold()
+        )
 
     def start(self):
         """Start the match_color thread"""
@@ -224,6 +308,18 @@ class ColorThreadRunner:
         """Read the transition duration from the config file."""
         return float(config["AverageColor"]["duration"])
 
+    @staticmethod
+    def get_target_fps():
+        """Read the most frames a second a continuous effect may run at; 0 for no limit."""
+        return config["AverageColor"].getfloat("targetfps", fallback=TARGET_FPS)
+
+    @staticmethod
+    def get_change_threshold():
+        """Read the smallest hsbk_delta worth sending."""
+        return config["AverageColor"].getfloat(
+            "changethreshold", fallback=CHANGE_THRESHOLD
+        )
+
     @staticmethod
     def get_brightness_offset():
         """Read the brightness offset from the config file."""
@@ -242,6 +338,98 @@ class ColorThreadRunner:
         return brightness
 
 
+class ZoneColorThreadRunner(ColorThreadRunner):
+    """A ColorThreadRunner for multizone devices whose color_function returns one color per
+    zone. A continuous effect's frames go through a ZoneStream: single unacknowledged
+    SetExtendedColorZones packets, however many zones the strip has, held to the device's
+    message budget, with an acked keyframe now and then in case one was lost."""
+
+    def match_color(self, bulb):
+        if not self.continuous:
+            super().match_color(bulb)
+            return
+        # Read once per run, like the group send budget
+        self.stream = ZoneStream(bulb, duration=int(self.get_duration() * 1000)).start()
+        try:
+            super().match_color(bulb)
+        finally:
+            self.stream.stop()
+
+    def next_color(self):
+        colors = self.color_function(initial_color=self.prev_color, **self.kwargs)
+        offset = self.get_brightness_offset()
+        for color in colors:
+            color[2] = self.limit_brightness(color[2] + offset)
+        # prev_color stays the frame's single color: color functions only take its kelvin
+        return colors
+
+    def send(self, bulb, color):
+        if self.continuous:
+            self.stream.push(color)
+            return
+        set_zone_colors(bulb, color, duration=int(self.get_duration() * 1000))
+
+    @staticmethod
+    def difference(color, other):
+        """The strip has changed as much as its most-changed zone."""
+        return max(map(hsbk_delta, color, other), default=0.0)
+
+
+class GroupColorThreadRunner(ColorThreadRunner):
+    """A ColorThreadRunner for a lifxlan Group: each frame's color is computed once and sent
+    to every member at once, unacknowledged, over the shared socket.
+
+    lifxlan's Group.set_color starts and joins a thread per member per call, each opening
+    its own socket, so a 10-bulb room ran 10x behind a single bulb. Frames are also held
+    to the group's send budget (groupsendbudget messages a second, one per member): a big
+    group drops frames rather than flooding the network."""
+
+    def match_color(self, bulb):
+        # A fresh budget per run, read from the settings as they are now
+        self.budget = SendBudget(self.get_group_send_budget())
+        self._devices, self._members = None, []
+        super().match_color(bulb)
+
+    def members(self):
+        """Color-capable devices in the group. Rescans add and remove them, so the device
+        list is checked every frame; supports_color is asked only when it changed."""
+        devices = self.bulb.get_device_list()
+        if devices != self._devices:
+            self._devices = list(devices)  # a copy: the group changes its own in place
+            self._members = [device for device in devices if device.supports_color()]
+        return self._members
+
+    def should_send(self, color, now):
+        return super().should_send(color, now) and self.budget.spend(
+            len(self.members()), now
+        )
+
+    def send(self, bulb, color):
+        if not self.continuous:  # one-shot (eyedropper): acked, via the group as before
+            super().send(bulb, color)
+            return
+        duration = self.get_duration() * 1000
+        members = self.members()
+        lan = [device for device in members if is_lan_device(device)]
+        if lan:
+            transport = shared_transport()
+            transport.submit_and_forget(
+                transport.set_all(
+                    lan, LightSetColor, {"color": color, "duration": duration}
+                )
+            )
+        for device in members:
+            if not is_lan_device(device):
+                device.set_color(color, duration=duration, rapid=True)
+
+    @staticmethod
+    def get_group_send_budget():
+        """Read how many messages a second a group effect may send."""
+        return config["AverageColor"].getfloat(
+            "groupsendbudget", fallback=GROUP_SEND_BUDGET
+        )
+
+
 # Route uncaught thread exceptions through sys.excepthook so they land in the app log.
 threading.excepthook = lambda args: sys.excepthook(
     args.exc_type, args.exc_value, args.exc_traceback
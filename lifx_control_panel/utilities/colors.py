@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Conversions between HSBK, RGB and color temperature, for one color or a whole array.
+
+kelvin_to_rgb is a curve fit -- two logs or powers per call -- and hsbk_to_rgb runs it for
+every color it converts. Both were called per pixel, per gradient column and per zone. Every
+temperature a LIFX device can show (KELVIN_MIN to KELVIN_MAX) is now looked up in a table
+computed once, and hsbk_to_rgb_array converts an (N, 4) array in one NumPy pass. Results are
+bit-for-bit what the scalar functions in utils always returned; see test/colors_test.py, and
+test/benchmarks.py for the speedup.
+
+The other way, rgb_to_hsbk is lifxlan's RGBtoHSBK, and rgb_to_hsbk_array its batch twin for
+per-zone and per-pixel work.
+"""
+
+import functools
+from math import floor, log
+from typing import List, Tuple
+
+import numpy as np
+
+# Every white point of every LIFX product; anything outside is computed, not looked up
+KELVIN_MIN = 1500
+KELVIN_MAX = 9000
+
+
+def kelvin_formula(temperature) -> Tuple[int, int, int]:
+    """Convert a Kelvin (K) color-temperature to an RGB value for display, the slow way.
+    Use kelvin_to_rgb; this is what its table is made of."""
+    # pylint: disable=invalid-name
+    temperature /= 100
+    if temperature <= 66:
+        red = 255
+        green = temperature
+        green = 99.4708025861 * log(green + 0.0000000001) - 161.1195681661
+    else:
+        red = temperature - 60
+        red = 329.698727466 * (red**-0.1332047592)
+        red = max(red, 0)
+        red = min(red, 255)
+        green = temperature - 60
+        green = 288.1221695283 * (green**-0.0755148492)
+    green = max(green, 0)
+    green = min(green, 255)
+    # calc blue
+    if temperature >= 66:
+        blue = 255
+    elif temperature <= 19:
+        blue = 0
+    else:
+        blue = temperature - 10
+        blue = 138.5177312231 * log(blue) - 305.0447927307
+        blue = max(blue, 0)
+        blue = min(blue, 255)
+    return int(red), int(green), int(blue)
+
+
+@functools.lru_cache(maxsize=None)
+def _kelvin_tuples() -> List[Tuple[int, int, int]]:
+    # Built on first use: ~7500 formula calls, a few milliseconds, once
+    return [kelvin_formula(kelvin) for kelvin in range(KELVIN_MIN, KELVIN_MAX + 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def kelvin_table() -> np.ndarray:
+    """(KELVIN_MAX - KELVIN_MIN + 1, 3) uint8 array: row k - KELVIN_MIN is kelvin k in RGB."""
+    table = np.array(_kelvin_tuples(), dtype=np.uint8)
+    table.flags.writeable = False  # shared by every caller
+    return table
+
+
+def kelvin_to_rgb(temperature) -> Tuple[int, int, int]:
+    """Convert a Kelvin (K) color-temperature to an RGB value for display."""
+    if KELVIN_MIN <= temperature <= KELVIN_MAX and temperature == int(temperature):
+        return _kelvin_tuples()[int(temperature) - KELVIN_MIN]
+    return kelvin_formula(temperature)
+
+
+def kelvin_to_rgb_array(kelvins) -> np.ndarray:
+    """kelvin_to_rgb for each of a 1-D array of temperatures, as an (N, 3) uint8 array."""
+    kelvins = np.asarray(kelvins)
+    in_table = (kelvins >= KELVIN_MIN) & (kelvins <= KELVIN_MAX) & (kelvins % 1 == 0)
+    if in_table.all():
+        return kelvin_table()[kelvins.astype(np.intp) - KELVIN_MIN]
+    rgb = np.empty((len(kelvins), 3), dtype=np.uint8)
+    rgb[in_table] = kelvin_table()[kelvins[in_table].astype(np.intp) - KELVIN_MIN]
+    rgb[~in_table] = [kelvin_formula(kelvin) for kelvin in kelvins[~in_table].tolist()]
+    return rgb
+
+
+def hsbk_to_rgb(hsvk) -> Tuple[int, int, int]:
+    """Convert Tuple in HSBK color-space to RGB space.
+    Converted from PHP https://gist.github.com/joshrp/5200913"""
+    # pylint: disable=invalid-name
+    iH, iS, iV, iK = hsvk
+    dS = (100 * iS / 65535) / 100.0  # Saturation: 0.0-1.0
+    dV = (100 * iV / 65535) / 100.0  # Lightness: 0.0-1.0
+    dC = dV * dS  # Chroma: 0.0-1.0
+    dH = (360 * iH / 65535) / 60.0  # H-prime: 0.0-6.0
+    dT = dH  # Temp variable
+
+    while dT >= 2.0:  # php modulus does not work with float
+        dT -= 2.0
+    dX = dC * (1 - abs(dT - 1))
+
+    dHf = floor(dH)
+    if dHf == 0:
+        dR, dG, dB = dC, dX, 0.0
+    elif dHf == 1:
+        dR, dG, dB = dX, dC, 0.0
+    elif dHf == 2:
+        dR, dG, dB = 0.0, dC, dX
+    elif dHf == 3:
+        dR, dG, dB = 0.0, dX, dC
+    elif dHf == 4:
+        dR, dG, dB = dX, 0.0, dC
+    elif dHf == 5:
+        dR, dG, dB = dC, 0.0, dX
+    else:
+        dR, dG, dB = 0.0, 0.0, 0.0
+
+    dM = dV - dC
+    dR += dM
+    dG += dM
+    dB += dM
+
+    # Finally, factor in Kelvin
+    # Adopted from:
+    # https://github.com/tort32/LightServer/blob/master/src/main/java/com/github/tort32/api/nodemcu/protocol/RawColor.java#L125
+    rgb_hsb = int(dR * 255), int(dG * 255), int(dB * 255)
+    rgb_k = kelvin_to_rgb(iK)
+    a = iS / 65535.0
+    b = (1.0 - a) / 255
+    x = int(rgb_hsb[0] * (a + rgb_k[0] * b))
+    y = int(rgb_hsb[1] * (a + rgb_k[1] * b))
+    z = int(rgb_hsb[2] * (a + rgb_k[2] * b))
+    return x, y, z
+
+
+def hsbk_to_rgb_array(hsbk) -> np.ndarray:
+    """hsbk_to_rgb for each row of an (N, 4) array of HSBK colors, as an (N, 3) uint8 array.
+
+    Every step is the scalar version's float64 arithmetic in the same order, so the results
+    match it exactly -- including its quirk of drawing hue 65535 (H' = 6.0) as black."""
+    hsbk = np.asarray(hsbk, dtype=np.float64).reshape(-1, 4)
+    hue, saturation, brightness, kelvin = hsbk.T
+    sat = (100 * saturation / 65535) / 100.0
+    value = (100 * brightness / 65535) / 100.0
+    chroma = value * sat
+    h_prime = (360 * hue / 65535) / 60.0
+    # The scalar loop's repeated "- 2.0" is exact on 0-6, and so is fmod
+    second = chroma * (1 - np.abs(np.fmod(h_prime, 2.0) - 1))
+    # Index 6 and up is the scalar version's else branch: black
+    sector = np.floor(h_prime).astype(np.intp).clip(0, 6)
+    zero = np.zeros_like(chroma)
+    rgb = np.stack(
+        [
+            np.choose(sector, (chroma, second, zero, zero, second, chroma, zero)),
+            np.choose(sector, (second, chroma, chroma, second, zero, zero, zero)),
+            np.choose(sector, (zero, zero, second, chroma, chroma, second, zero)),
+        ],
+        axis=1,
+    )
+    rgb += (value - chroma)[:, np.newaxis]
+    rgb_hsb = np.trunc(rgb * 255)
+    a = (saturation / 65535.0)[:, np.newaxis]
+    b = (1.0 - a) / 255
+    return np.trunc(rgb_hsb * (a + kelvin_to_rgb_array(kelvin) * b)).astype(np.uint8)
+
+
+def rgb_to_hsbk(rgb, temperature=3500, dark_cutoff=0) -> Tuple[int, int, int, int]:
+    """lifxlan's RGBtoHSBK, clamped to 65535, and with saturation dropped to 0 for colors
+    whose brightest channel is below dark_cutoff.
+
+    RGBtoHSBK derives hue/saturation from (cmax-cmin)/cmax, so a noise pixel like (1, 0, 1)
+    comes out fully-saturated magenta; dark_cutoff is how dark is too dark to have a hue.
+    """
+    red, green, blue = rgb
+    cmax = max(rgb)
+    cmin = min(rgb)
+    cdel = cmax - cmin
+    brightness = int((cmax / 255) * 65535)
+    if cdel != 0:
+        saturation = int(((cdel) / cmax) * 65535)
+        redc = (cmax - red) / (cdel)
+        greenc = (cmax - green) / (cdel)
+        bluec = (cmax - blue) / (cdel)
+        if red == cmax:
+            hue = bluec - greenc
+        elif green == cmax:
+            hue = 2 + redc - bluec
+        else:
+            hue = 4 + greenc - redc
+        hue = hue / 6
+        if hue < 0:
+            hue = hue + 1
+        hue = int(hue * 65535)
+    else:
+        saturation = 0
+        hue = 0
+    if cmax < dark_cutoff:
+        saturation = 0
+    return min(hue, 65535), min(saturation, 65535), min(brightness, 65535), temperature
+
+
+def rgb_to_hsbk_array(rgb, temperature=3500, dark_cutoff=0) -> np.ndarray:
+    """rgb_to_hsbk for each row of an (N, 3) array of RGB colors, as an (N, 4) uint16 array.
+    The arithmetic is rgb_to_hsbk's, step for step, so the results match it exactly."""
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    red, green, blue = rgb.T
+    cmax = rgb.max(axis=1)
+    cdel = cmax - rgb.min(axis=1)
+    hsbk = np.empty((len(rgb), 4), dtype=np.uint16)
+    hsbk[:, 2] = np.minimum(np.trunc((cmax / 255) * 65535), 65535)
+    hsbk[:, 3] = temperature
+    with np.errstate(divide="ignore", invalid="ignore"):  # gray rows; zeroed below
+        saturation = np.trunc((cdel / cmax) * 65535)
+        redc = (cmax - red) / cdel
+        greenc = (cmax - green) / cdel
+        bluec = (cmax - blue) / cdel
+        hue = np.where(
+            red == cmax,
+            bluec - greenc,
+            np.where(green == cmax, 2 + redc - bluec, 4 + greenc - redc),
+        )
+    hue = hue / 6
+    hue = np.where(hue < 0, hue + 1, hue)
+    gray = cdel == 0
+    hsbk[:, 0] = np.where(gray, 0, np.minimum(np.trunc(hue * 65535), 65535))
+    hsbk[:, 1] = np.where(gray | (cmax < dark_cutoff), 0, np.minimum(saturation, 65535))
+    return hsbk
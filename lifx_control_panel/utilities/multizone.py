@@ -9,14 +9,27 @@ look like it "works once and never again".
 
 SetExtendedColorZones (510, firmware 2.77+) carries up to 82 zones in a single packet, so a
 whole strip costs one acked message.
+
+Animations go through ZoneStream instead: unacked frames paced to the device's budget, stale
+frames dropped rather than queued, and an acked keyframe every so often to resync.
+
+Real devices are reached over the shared LanTransport socket; anything else (test dummies)
+through its own req_with_ack/set_zone_color.
 """
 
-import bitstring
+import logging
+import threading
+import time
+
 import lifxlan
-from lifxlan.message import Message, little_endian
-from lifxlan.msgtypes import GetHostFirmware, StateHostFirmware
+from lifxlan.msgtypes import (
+    GetHostFirmware,
+    MultiZoneSetColorZones,
+    StateHostFirmware,
+)
 
-MAX_EXTENDED_ZONES = 82
+from .packets import MAX_EXTENDED_ZONES, StructMessage, pack_extended_color_zones
+from .transport import is_lan_device, shared_transport
 
 APPLY = 1  # apply this message's zones immediately, plus any pending ones
 
@@ -26,9 +39,36 @@ APPLY = 1  # apply this message's zones immediately, plus any pending ones
 # the GUI thread rather than blocking tkinter.
 DEFAULT_ATTEMPTS = 2
 
+# ZoneStream: messages a second a stream may send one device, leaving the heartbeat room in
+# its ~20, and seconds between the acked frames that resync a strip after lost packets
+STREAM_RATE = 15
+KEYFRAME_INTERVAL = 2.0
+
+# Seconds before a device that didn't answer the firmware query is asked again. Each ask can
+# block its caller for a second, and a device too busy to answer won't be less busy next frame.
+FIRMWARE_RETRY_INTERVAL = 30.0
+
+
+def _req_with_ack(target, msg_type, payload):
+    """target.req_with_ack, but over the shared socket when the target is on the LAN."""
+    if not is_lan_device(target):
+        return target.req_with_ack(msg_type, payload)
+    transport = shared_transport()
+    return transport.submit(transport.ack(target, msg_type, payload)).result()
+
+
+def _fire_and_forget(target, msg_type, payload):
+    """One unacknowledged packet; over the shared socket when the target is on the LAN."""
+    if not is_lan_device(target):
+        target.fire_and_forget(msg_type, payload, num_repeats=1)
+        return
+    transport = shared_transport()
+    transport.submit_and_forget(transport.set(target, msg_type, payload))
 
-class SetExtendedColorZones(Message):
-    """LIFX message 510. `colors` is padded to the fixed-length 82-color array on the wire."""
+
+class SetExtendedColorZones(StructMessage):
+    """LIFX message 510. `colors` is padded to the fixed-length 82-color array on the wire.
+    Packed with struct: a zone stream builds one of these every frame."""
 
     def __init__(
         self,
@@ -52,20 +92,9 @@ class SetExtendedColorZones(Message):
         self.payload_fields.append(("Apply", self.apply))
         self.payload_fields.append(("Zone Index", self.zone_index))
         self.payload_fields.append(("Colors", self.colors))
-        payload = (
-            little_endian(bitstring.pack("32", self.duration))
-            + little_endian(bitstring.pack("8", self.apply))
-            + little_endian(bitstring.pack("16", self.zone_index))
-            + little_endian(bitstring.pack("8", len(self.colors)))
-        )
-        padded = list(self.colors) + [(0, 0, 0, 0)] * (
-            MAX_EXTENDED_ZONES - len(self.colors)
+        return pack_extended_color_zones(
+            self.duration, self.apply, self.zone_index, self.colors
         )
-        for color in padded:
-            payload += b"".join(
-                little_endian(bitstring.pack("16", field)) for field in color
-            )
-        return payload
 
 
 def supports_extended(target):
@@ -81,11 +110,20 @@ def supports_extended(target):
     cached = getattr(target, "supports_extended_multizone", None)
     if cached is not None:
         return cached
+    if time.monotonic() < getattr(target, "firmware_retry_at", 0):
+        return True
     try:
-        response = target.req_with_resp(GetHostFirmware, StateHostFirmware)
+        if is_lan_device(target):
+            transport = shared_transport()
+            response = transport.submit(
+                transport.get(target, GetHostFirmware, StateHostFirmware)
+            ).result()
+        else:
+            response = target.req_with_resp(GetHostFirmware, StateHostFirmware)
     except lifxlan.WorkflowException:
-        # Unknown for now; ask again next time. Assume yes meanwhile -- one packet is the
+        # Unknown for now; ask again in a while. Assume yes meanwhile -- one packet is the
         # guess that can't make a struggling device worse.
+        target.firmware_retry_at = time.monotonic() + FIRMWARE_RETRY_INTERVAL
         return True
     target.supports_extended_multizone = (
         response.version >> 16,
@@ -94,14 +132,28 @@ def supports_extended(target):
     return target.supports_extended_multizone
 
 
-def set_zone_colors(target, colors, duration=0, attempts=DEFAULT_ATTEMPTS):
+def uses_extended(target, colors):
+    """Whether set_zone_colors puts colors on target in one extended message."""
+    return len(colors) <= MAX_EXTENDED_ZONES and supports_extended(target)
+
+
+def set_zone_colors(
+    target, colors, duration=0, attempts=DEFAULT_ATTEMPTS, rapid=False, extended=None
+):
     """Push a full list of per-zone HSBK colors to a multizone device.
 
     One packet via extended multizone where possible, otherwise one acked legacy message per
     run of equal-colored zones. Raises WorkflowException if the device never acknowledged.
+
+    With rapid, nothing is acked or retried: the colors go out once and this returns at once.
+    That's for streams (screen ambilight), where the next frame replaces a lost one anyway.
+
+    extended is uses_extended(target, colors), for callers that have already worked it out.
     """
-    if len(colors) > MAX_EXTENDED_ZONES or not supports_extended(target):
-        _set_zone_colors_legacy(target, colors, duration, attempts)
+    if extended is None:
+        extended = uses_extended(target, colors)
+    if not extended:
+        _set_zone_colors_legacy(target, colors, duration, attempts, rapid)
         return
     payload = {
         "duration": duration,
@@ -109,36 +161,241 @@ def set_zone_colors(target, colors, duration=0, attempts=DEFAULT_ATTEMPTS):
         "zone_index": 0,
         "colors": [tuple(color) for color in colors],
     }
+    if rapid:
+        _fire_and_forget(target, SetExtendedColorZones, payload)
+        return
     error = None
     for attempt in range(attempts):
         try:
-            return target.req_with_ack(SetExtendedColorZones, payload)
+            return _req_with_ack(target, SetExtendedColorZones, payload)
         except lifxlan.WorkflowException as exc:
             error = exc
     raise error
 
 
-def _set_zone_colors_legacy(target, colors, duration=0, attempts=DEFAULT_ATTEMPTS):
-    """Fallback for pre-2.77 firmware and strips longer than 82 zones.
-
-    Equal neighbouring zones coalesce into one acked SetColorZones, and a run that doesn't ack
-    is retried once because lifxlan's req_with_ack gives up after a single attempt.
-    """
+def _color_runs(colors):
+    """[start, end, color] for each run of equal neighbouring zones."""
     runs = []
     for index, color in enumerate(colors):
         if runs and tuple(runs[-1][2]) == tuple(color):
             runs[-1][1] = index  # protocol end_index is INCLUSIVE
         else:
             runs.append([index, index, color])
+    return runs
+
+
+def message_cost(target, colors, extended=None):
+    """How many messages set_zone_colors spends putting colors on target."""
+    if extended is None:
+        extended = uses_extended(target, colors)
+    if extended:
+        return 1
+    return len(_color_runs(colors))
+
+
+def _set_zone_colors_legacy(
+    target, colors, duration=0, attempts=DEFAULT_ATTEMPTS, rapid=False
+):
+    """Fallback for pre-2.77 firmware and strips longer than 82 zones.
+
+    Equal neighbouring zones coalesce into one acked SetColorZones, and a run that doesn't ack
+    is retried once because lifxlan's req_with_ack gives up after a single attempt.
+
+    A rapid stream can't be one packet here: it costs a message per run, so a strip on old
+    firmware following a busy screen runs well past its ~20 messages a second.
+    """
+    runs = _color_runs(colors)
+    if rapid:
+        for start, end, color in runs:
+            if is_lan_device(target):
+                _fire_and_forget(
+                    target,
+                    MultiZoneSetColorZones,
+                    {
+                        "start_index": start,
+                        "end_index": end,
+                        "color": color,
+                        "duration": duration,
+                        "apply": APPLY,
+                    },
+                )
+            else:
+                target.set_zone_color(start, end, color, duration, rapid=True)
+        return
     error = None
     for start, end, color in runs:
         # ponytail: every run applies immediately rather than buffering with apply=0 and one
         # final apply -- a dropped run can't then strand the rest of the strip unapplied.
         for attempt in range(attempts):
             try:
-                target.set_zone_color(start, end, color, duration)
+                if is_lan_device(target):
+                    _req_with_ack(
+                        target,
+                        MultiZoneSetColorZones,
+                        {
+                            "start_index": start,
+                            "end_index": end,
+                            "color": color,
+                            "duration": duration,
+                            "apply": APPLY,
+                        },
+                    )
+                else:
+                    target.set_zone_color(start, end, color, duration)
                 break
             except lifxlan.WorkflowException as exc:
                 error = exc
     if error is not None:
         raise error
+
+
+class ZoneStream:
+    """Streams frames of zone colors to one multizone device, paced to what it can absorb.
+
+    Frames are pushed, or pulled from an iterable on a thread of the stream's own, and go out
+    unacknowledged at most `rate` messages a second -- one per frame on extended firmware,
+    one per run of equal zones otherwise. Nothing queues: a frame pushed before the last one
+    went out replaces it, so a busy device shows the newest colors a little late rather than
+    falling ever further behind. Every keyframe_interval seconds a frame goes out acked
+    instead, and the last frame is resent that way even when no new one arrives: a lost
+    packet leaves the strip wrong until the next keyframe, not until the next change.
+
+    A keyframe that isn't acked doesn't stop the stream; the next frame is a keyframe too.
+    """
+
+    def __init__(
+        self,
+        target,
+        frames=None,
+        duration=0,
+        rate=STREAM_RATE,
+        keyframe_interval=KEYFRAME_INTERVAL,
+    ):
+        self.target = target
+        self.frames = frames
+        self.duration = duration
+        self.rate = rate
+        self.keyframe_interval = keyframe_interval
+        self.sent = 0
+        self.dropped = 0  # frames replaced by a newer one before they went out
+        self.keyframes = 0
+        self.missed_keyframes = 0
+        self.logger = logging.getLogger("root")
+        self._pending = None
+        self._last = None  # the newest frame sent; resent as the keyframe
+        self._next_send = 0.0  # when the device has budget for another message
+        self._keyframe_at = 0.0  # the first frame is a keyframe
+        self._stopped = False
+        self._changed = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start sending; returns the stream."""
+        self._threads = [
+            threading.Thread(target=self._send_frames, name="ZoneStream", daemon=True)
+        ]
+        if self.frames is not None:
+            self._threads.append(
+                threading.Thread(
+                    target=self._pull_frames, name="ZoneStream.frames", daemon=True
+                )
+            )
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop sending and wait for the stream's threads to finish."""
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def push(self, colors):
+        """Send colors as the next frame, replacing one still waiting to go out."""
+        frame = [tuple(color) for color in colors]
+        with self._changed:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = frame
+            self._changed.notify_all()
+
+    def _pull_frames(self):
+        for colors in self.frames:
+            with self._changed:
+                # Stay at most a frame ahead of the device: a generator is asked for its
+                # next frame once the last went out, or a frame time later if the device
+                # is held up -- and then that newer frame replaces the one waiting.
+                self._changed.wait_for(
+                    lambda: self._stopped or self._pending is None, 1 / self.rate
+                )
+                if self._stopped:
+                    return
+            self.push(colors)
+
+    def _next_frame(self):
+        """(colors, keyframe) once the device has budget for them, or None once stopped."""
+        with self._changed:
+            while not self._stopped:
+                now = time.monotonic()
+                if now < self._next_send:
+                    # Frames pushed meanwhile replace the pending one; they don't wake this
+                    self._changed.wait_for(lambda: self._stopped, self._next_send - now)
+                elif self._pending is not None:
+                    colors, self._pending = self._pending, None
+                    return colors, now >= self._keyframe_at
+                elif self._last is not None and now >= self._keyframe_at:
+                    return self._last, True
+                else:
+                    self._changed.wait(
+                        None if self._last is None else self._keyframe_at - now
+                    )
+        return None
+
+    def _send_frames(self):
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            try:
+                self._send(*frame)
+            except Exception:  # pylint: disable=broad-except
+                # A bad color or a closed transport mustn't end the thread while push()
+                # keeps taking frames: skip this one, and try again after the usual pacing
+                self.logger.exception("ZoneStream couldn't send a frame")
+                with self._changed:
+                    now = time.monotonic()
+                    self._next_send = now + 1 / self.rate
+                    if frame[1]:
+                        self._keyframe_at = now + self.keyframe_interval
+
+    def _send(self, colors, keyframe):
+        started = time.monotonic()
+        extended = uses_extended(self.target, colors)
+        cost = message_cost(self.target, colors, extended)
+        missed = False
+        try:
+            if keyframe:
+                set_zone_colors(
+                    self.target, colors, self.duration, attempts=1, extended=extended
+                )
+            else:
+                set_zone_colors(
+                    self.target, colors, self.duration, rapid=True, extended=extended
+                )
+        except lifxlan.WorkflowException:
+            missed = True
+        except OSError:
+            # The network hiccuped; the next frame or keyframe puts things right
+            self.logger.info("ZoneStream send failed", exc_info=True)
+        with self._changed:
+            self._last = colors
+            self._next_send = started + cost / self.rate
+            self.sent += 1
+            if keyframe:
+                self.keyframes += 1
+                if missed:
+                    self.missed_keyframes += 1
+                self._keyframe_at = started + (0 if missed else self.keyframe_interval)
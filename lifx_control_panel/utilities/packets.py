@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""LIFX packet encoding with precompiled structs.
+
+lifxlan packs every field through bitstring and little_endian: an object, a bit-string and a
+byte-by-byte reversal per field. That's fine for a GetPower, but SetExtendedColorZones has 332
+fields (82 padded HSBK colors), and a zone stream sends one every frame -- encoding it cost
+more than everything else in the frame put together. Here the 36-byte header and the 510
+payload are each one struct.pack. The bytes are identical to lifxlan's; see
+test/packets_test.py, and test/benchmarks.py for the speedup.
+"""
+
+import struct
+from itertools import chain, repeat
+
+from lifxlan.message import HEADER_SIZE_BYTES, Message
+
+# Frame: size, origin/tagged/addressable/protocol, source. Frame address: target MAC (6 bytes
+# padded to 8), 6 reserved bytes, response flags, sequence. Protocol header: 8 reserved bytes,
+# message type, 2 reserved bytes.
+HEADER = struct.Struct("<HHI6s2x6xBB8xHxx")
+
+MAX_EXTENDED_ZONES = 82
+
+# Duration, apply, zone index, colors count, then all 82 HSBK slots
+EXTENDED_PAYLOAD = struct.Struct(f"<IBHB{MAX_EXTENDED_ZONES * 4}H")
+
+
+def pack_header(message: Message, payload_size: int) -> bytes:
+    """lifxlan's Message.get_header for message, followed by payload_size bytes of payload."""
+    return HEADER.pack(
+        HEADER_SIZE_BYTES + payload_size,
+        (
+            message.origin << 14
+            | message.tagged << 13
+            | message.addressable << 12
+            | message.protocol
+        ),
+        message.source_id,
+        bytes.fromhex(message.target_addr.replace(":", "")),
+        message.ack_requested << 1 | message.response_requested,
+        message.seq_num,
+        message.message_type,
+    )
+
+
+def pack_extended_color_zones(duration, apply, zone_index, colors) -> bytes:
+    """The SetExtendedColorZones (510) payload: colors, zero-padded to all 82 slots."""
+    return EXTENDED_PAYLOAD.pack(
+        duration,
+        apply,
+        zone_index,
+        len(colors),
+        *chain.from_iterable(colors),
+        *repeat(0, (MAX_EXTENDED_ZONES - len(colors)) * 4),
+    )
+
+
+class StructMessage(Message):
+    """A lifxlan Message whose header is packed by pack_header rather than bitstring.
+    Subclasses pack their own payload in get_payload."""
+
+    def generate_packed_message(self):
+        self.payload = self.get_payload()
+        self.size = HEADER_SIZE_BYTES + len(self.payload)
+        self.header = pack_header(self, len(self.payload))
+        return self.header + self.payload
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Devices remembered between launches.
+
+A cold start used to be a full broadcast discovery (lifxlan waits out its timeouts whatever
+answers), then a GetVersion and a state prefetch per bulb, before the first frame was drawn.
+But the bulbs in a house rarely change. After each successful scan the registry writes what
+it learned -- address, product, label, group, zone count, extended-multizone support -- to
+REGISTRY_FILE, next to config.ini. The next launch asks each of those addresses for its
+state directly, all at once over the shared transport, and builds frames from whatever
+answers. Broadcast discovery still runs, in the background, only to find the bulbs that
+are new.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import lifxlan
+from lifxlan.msgtypes import LightGet, LightState
+
+REGISTRY_FILE = "devices.json"  # relative to cwd, like config.ini
+REGISTRY_VERSION = 1
+
+# A bulb that's on answers a unicast LightGet in a few ms. Two quick tries keep one lost packet
+# from costing a known bulb its frame, and a bulb that's gone holds startup for half a second.
+PROBE_TIMEOUT = 0.25  # seconds
+PROBE_ATTEMPTS = 2
+
+
+@functools.lru_cache(maxsize=None)
+def is_multizone_product(product: Optional[int]) -> bool:
+    """A product id's features never change; look each one up once per run."""
+    return lifxlan.features_map.get(product, lifxlan.features_map[None])["multizone"]
+
+
+class DeviceRecord(NamedTuple):
+    """What a scan learned about one device, enough to talk to it and build its frame."""
+
+    mac_addr: str
+    ip_addr: str
+    port: int
+    product: Optional[int]
+    label: str
+    group: Optional[str] = None
+    zones: Optional[int] = None  # None for anything that isn't multizone
+    extended: Optional[bool] = None  # firmware knows SetExtendedColorZones (510)
+
+    @classmethod
+    def from_device(cls, device, group=None, zones=None) -> "DeviceRecord":
+        return cls(
+            mac_addr=device.mac_addr,
+            ip_addr=device.ip_addr,
+            port=device.port,
+            product=getattr(device, "product", None),
+            label=device.label,
+            group=group,
+            zones=zones,
+            extended=getattr(device, "supports_extended_multizone", None),
+        )
+
+    def to_device(self, source_id) -> lifxlan.Light:
+        """A lifxlan device for this record, with everything it recorded already cached."""
+        # The product says what it is; zones is only known once a strip's frame was built
+        if self.product is not None:
+            multizone = is_multizone_product(self.product)
+        else:
+            multizone = bool(self.zones)
+        device_class = lifxlan.MultiZoneLight if multizone else lifxlan.Light
+        device = device_class(self.mac_addr, self.ip_addr, 1, self.port, source_id)
+        device.product = self.product
+        device.label = self.label
+        if self.extended is not None:
+            # Firmware doesn't change between launches; see multizone.supports_extended
+            device.supports_extended_multizone = self.extended
+        return device
+
+
+class DeviceRegistry:
+    """Reads and writes the device cache. Never raises: a missing, stale or corrupt file only
+    means a slower start."""
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.logger = logging.getLogger("root")
+
+    def load(self) -> Dict[str, DeviceRecord]:
+        """{mac_addr: record} from the last successful scan, or {} if there isn't one."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") != REGISTRY_VERSION:
+                return {}
+            records = [DeviceRecord(**entry) for entry in data["devices"]]
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as exc:
+            self.logger.warning(
+                "Ignoring unreadable device cache %s: %s", self.path, exc
+            )
+            return {}
+        return {record.mac_addr: record for record in records}
+
+    def save(self, records: Iterable[DeviceRecord]):
+        data = {
+            "version": REGISTRY_VERSION,
+            "devices": [record._asdict() for record in records],
+        }
+        try:
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump(data, file, indent=2)
+        except OSError as exc:
+            self.logger.warning("Couldn't save device cache %s: %s", self.path, exc)
+
+    @staticmethod
+    def probe(transport, records: Iterable[DeviceRecord]) -> List[lifxlan.Light]:
+        """Ask every recorded device for its state at once; return those that answered.
+
+        Each one comes back with label, power and color cached from its LightState reply, the
+        same attributes scan_for_lights' prefetch warms, so frames build without touching the
+        LAN. Blocks for at most PROBE_TIMEOUT * PROBE_ATTEMPTS."""
+        devices = [record.to_device(transport.source_id) for record in records]
+        live = []
+        for device, state in probe_devices(transport, devices):
+            device.label = state.label
+            device.power_level = state.power_level
+            device.color = tuple(state.color)
+            live.append(device)
+        return live
+
+
+def probe_devices(transport, devices) -> List[Tuple[lifxlan.Light, LightState]]:
+    """(device, LightState) for each of devices that answered a unicast LightGet. The devices
+    themselves are left as they were."""
+    if not devices:
+        return []
+    states = transport.submit(_probe_all(transport, devices)).result()
+    # unplugged, or moved address; broadcast discovery is what finds those
+    return [
+        (device, state)
+        for device, state in zip(devices, states)
+        if not isinstance(state, lifxlan.WorkflowException)
+    ]
+
+
+async def _probe_all(transport, devices):
+    return await asyncio.gather(
+        *(
+            transport.get(
+                device,
+                LightGet,
+                LightState,
+                timeout=PROBE_TIMEOUT,
+                attempts=PROBE_ATTEMPTS,
+            )
+            for device in devices
+        ),
+        return_exceptions=True,
+    )
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""When to poll each device.
+
+A fixed-cadence heartbeat treats every device alike: a dead bulb costs a full timeout every
+tick, and a Beam already dropping one packet in five gets polled exactly as hard as a healthy
+bulb. HeartbeatScheduler keeps a priority queue of per-device due times instead. The device
+on screen is polled fastest, devices that time out back off exponentially, and each device
+has at most MAX_IN_FLIGHT requests outstanding -- a device absorbs about 20 messages a second
+(see multizone.py), and the heartbeat shouldn't be the thing that spends them.
+
+Everything it knows is exposed by `snapshot`, so "why is this bulb slow" has an answer.
+
+SendBudget rations the other direction: how many messages an effect may send a whole group.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+MAX_IN_FLIGHT = 1  # heartbeat requests outstanding per device
+MAX_BACKOFF = 300.0  # seconds; an unplugged bulb is still retried every five minutes
+EWMA_WEIGHT = 0.2  # how much the newest sample moves rtt/loss
+
+
+class DeviceStats:
+    """Round-trip time and loss rate for one device, as exponentially weighted averages."""
+
+    def __init__(self):
+        self.rtt = None  # seconds
+        self.loss = 0.0  # fraction of polls that timed out
+        self.failures = 0  # consecutive timeouts; drives the backoff
+        self.in_flight = 0
+        self.sent = 0
+        self.answered = 0
+
+    def record_reply(self, rtt):
+        self.rtt = (
+            rtt if self.rtt is None else self.rtt + EWMA_WEIGHT * (rtt - self.rtt)
+        )
+        self.loss -= EWMA_WEIGHT * self.loss
+        self.failures = 0
+        self.answered += 1
+
+    def record_timeout(self):
+        self.loss += EWMA_WEIGHT * (1 - self.loss)
+        self.failures += 1
+
+    def as_dict(self):
+        return {
+            "rtt_ms": None if self.rtt is None else round(self.rtt * 1000, 1),
+            "loss": round(self.loss, 3),
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "answered": self.answered,
+        }
+
+
+class SendBudget:
+    """Token bucket: at most `rate` messages a second on average, in bursts of up to a
+    second's worth. Safe to call from any thread."""
+
+    def __init__(self, rate, now=None):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic() if now is None else now
+        self._lock = threading.Lock()
+
+    def spend(self, count, now=None):
+        """Take count messages from the budget and return True, or False if it's spent.
+
+        A batch bigger than the whole budget still goes out once the bucket is full, and
+        its overdraft is paid back before the next one."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens < min(count, self.rate):
+                return False
+            self._tokens -= count
+            return True
+
+
+class HeartbeatScheduler:
+    """Priority queue of per-device poll times. Safe to call from any thread.
+
+    Devices are keyed by label, like AsyncBulbInterface's caches. Each has a base interval;
+    the focused device uses focus_interval instead, and every consecutive timeout doubles
+    whichever applies, up to MAX_BACKOFF.
+    """
+
+    def __init__(self, focus_interval, max_in_flight=MAX_IN_FLIGHT):
+        self.focus_interval = focus_interval
+        self.max_in_flight = max_in_flight
+        self.focus = None
+        self.stats = {}
+        self._intervals = {}
+        self._due = {}  # label -> due time; heap entries that disagree are stale
+        self._heap = []
+        self._counter = itertools.count()  # tie-break so labels are never compared
+        self._lock = threading.Lock()
+
+    def add(self, label, interval, now=None):
+        """Start scheduling label every `interval` seconds, with its first poll due now."""
+        with self._lock:
+            self._intervals[label] = interval
+            self.stats.setdefault(label, DeviceStats())
+            self._push(label, time.monotonic() if now is None else now)
+
+    def remove(self, label):
+        with self._lock:
+            self._intervals.pop(label, None)
+            self._due.pop(label, None)
+            self.stats.pop(label, None)
+            if self.focus == label:
+                self.focus = None
+
+    def set_focus(self, label, now=None):
+        """Poll label at focus_interval from now on, starting right away."""
+        with self._lock:
+            self.focus = label
+            if label in self._intervals:
+                self._push(label, time.monotonic() if now is None else now)
+
+    def poll_soon(self, label, now=None):
+        """Make label due now: something suggests its state changed, but isn't the state."""
+        with self._lock:
+            if label in self._intervals:
+                self._push(label, time.monotonic() if now is None else now)
+
+    def interval(self, label):
+        """Seconds between polls of label right now, backoff included."""
+        base = self.focus_interval if label == self.focus else self._intervals[label]
+        failures = self.stats[label].failures
+        return min(base * 2**failures, max(base, MAX_BACKOFF))
+
+    def pop_due(self, now=None):
+        """Labels whose poll is due and that have room in flight. They're counted as in
+        flight until completed() or failed() is called for them."""
+        now = time.monotonic() if now is None else now
+        due, deferred = [], []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                when, _, label = entry
+                if self._due.get(label) != when:
+                    continue  # rescheduled or removed since this entry was pushed
+                stats = self.stats[label]
+                if stats.in_flight >= self.max_in_flight:
+                    # Still due; try again once a reply frees a slot
+                    deferred.append(entry)
+                    continue
+                stats.in_flight += 1
+                stats.sent += 1
+                del self._due[label]
+                due.append(label)
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+        return due
+
+    def completed(self, label, rtt, now=None):
+        """A poll of label was answered after rtt seconds."""
+        with self._lock:
+            stats = self.stats.get(label)
+            if stats is None:
+                return
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.record_reply(rtt)
+            self._reschedule(label, now)
+
+    def failed(self, label, now=None):
+        """A poll of label timed out; back it off."""
+        with self._lock:
+            stats = self.stats.get(label)
+            if stats is None:
+                return
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.record_timeout()
+            self._reschedule(label, now)
+
+    def heard(self, label, now=None):
+        """label's state arrived unasked (a broadcast, an ack): no need to poll it for a
+        while, and it's evidently alive."""
+        with self._lock:
+            stats = self.stats.get(label)
+            if stats is None:
+                return
+            stats.failures = 0
+            if stats.in_flight == 0:
+                self._reschedule(label, now)
+
+    def next_due_in(self, now=None):
+        """Seconds until the earliest scheduled poll (0 if one is overdue), or None."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._due:
+                return None
+            return max(0.0, min(self._due.values()) - now)
+
+    def snapshot(self, now=None):
+        """{label: stats plus its interval and seconds until its next poll}."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            result = {}
+            for label, stats in self.stats.items():
+                info = stats.as_dict()
+                info["interval"] = self.interval(label)
+                due = self._due.get(label)
+                info["due_in"] = None if due is None else round(due - now, 3)
+                info["focused"] = label == self.focus
+                result[label] = info
+            return result
+
+    def _reschedule(self, label, now):
+        now = time.monotonic() if now is None else now
+        self._push(label, now + self.interval(label))
+
+    def _push(self, label, when):
+        self._due[label] = when
+        heapq.heappush(self._heap, (when, next(self._counter), label))
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""One UDP socket for all device traffic.
+
+Every lifxlan getter and setter opens, binds and closes a socket of its own, then blocks the
+calling thread in recvfrom until the reply or a one-second timeout. Polling 40 bulbs that way
+takes a pool thread per bulb, each spending nearly all of its life waiting on the LAN.
+
+LanTransport binds a single socket on an asyncio loop that runs in one daemon thread. Every
+request goes out stamped with our source id and a wrapping 8-bit sequence number, and replies
+are matched back to their request by (source, sequence) -- the pair the protocol echoes for
+exactly this purpose -- so any number of devices can be in flight at once. Other threads hand
+coroutines to `submit` and get a concurrent.futures.Future back; they only block if they
+actually want the answer.
+
+Listeners see everything else that arrives: replies to our own requests, and the State*
+packets devices broadcast when some other app changes them. AsyncBulbInterface keeps its
+caches current from those instead of polling every device on a timer.
+"""
+
+import asyncio
+import logging
+import random
+import socket
+import threading
+
+import lifxlan
+from lifxlan.message import BROADCAST_MAC
+from lifxlan.msgtypes import Acknowledgement
+from lifxlan.unpack import unpack_lifx_message
+
+# Same per-try budget as lifxlan, so callers' retry counts mean what they meant before
+DEFAULT_TIMEOUT = 1.0  # seconds
+DEFAULT_ATTEMPTS = 1
+
+SEQUENCE_SPACE = 256  # the header's sequence field is a uint8
+LIFX_PORT = 56700
+
+
+def is_lan_device(target) -> bool:
+    """Whether target can be addressed by the transport: a real lifxlan device with a known
+    address. Groups and the test dummies keep using their own (blocking) methods."""
+    return isinstance(target, lifxlan.Device) and bool(getattr(target, "ip_addr", None))
+
+
+class _LanProtocol(asyncio.DatagramProtocol):
+    """Hands every datagram on the socket to its LanTransport."""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def datagram_received(self, data, addr):
+        self.owner._dispatch(data, addr)  # pylint: disable=protected-access
+
+    def error_received(self, exc):
+        # On Windows an ICMP port-unreachable from an earlier send surfaces here as a
+        # ConnectionResetError (see _ResetTolerantSocket in __main__). The socket is fine;
+        # only that one datagram is lost, and its request times out and retries on its own.
+        self.owner.logger.debug("Ignoring socket error: %s", exc)
+
+
+class LanTransport:
+    """Asynchronous request/response over one bound UDP socket.
+
+    Coroutines (get/ack/set) must run on `loop`; use `submit` from any other thread.
+    """
+
+    def __init__(self, source_id=None, port=0, listen=False):
+        self.source_id = source_id or random.randrange(2, 1 << 32)
+        self.port = port
+        self.listen = listen
+        self.loop = None
+        self.logger = logging.getLogger("root")
+        self._transport = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+        self._sequence = 0
+        # (source, sequence) -> (future, accepted reply types, target, request)
+        self._pending = {}
+        self._listeners = []
+
+    def start(self):
+        """Bind the socket and start the loop thread. Returns self, so it chains."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(
+            target=self._run, name="LanTransport", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread = None
+            raise lifxlan.WorkflowException(
+                f"WorkflowException: error {self._error} while trying to open socket"
+            )
+        return self
+
+    def stop(self):
+        """Close the socket and stop the loop. Requests still in flight fail."""
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def address(self):
+        """(host, port) the socket is bound to."""
+        return self._transport.get_extra_info("sockname")
+
+    def submit(self, coro):
+        """Schedule coro on the transport's loop from any thread; returns a
+        concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def submit_and_forget(self, coro):
+        """submit() for sends nobody waits on, like set(): with no caller to see an error,
+        it's logged instead of dying unnoticed in the future."""
+        future = self.submit(coro)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def _log_failure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error("Unwatched send failed", exc_info=future.exception())
+
+    async def get(
+        self,
+        target,
+        msg_type,
+        response_type,
+        payload=None,
+        timeout=DEFAULT_TIMEOUT,
+        attempts=DEFAULT_ATTEMPTS,
+    ):
+        """Send msg_type with res_required and return the device's response_type reply."""
+        return await self._request(
+            target,
+            msg_type,
+            payload,
+            (response_type,),
+            ack=False,
+            timeout=timeout,
+            attempts=attempts,
+        )
+
+    async def ack(
+        self,
+        target,
+        msg_type,
+        payload=None,
+        timeout=DEFAULT_TIMEOUT,
+        attempts=DEFAULT_ATTEMPTS,
+    ):
+        """Send msg_type with ack_required and wait for the Acknowledgement."""
+        return await self._request(
+            target,
+            msg_type,
+            payload,
+            (Acknowledgement,),
+            ack=True,
+            timeout=timeout,
+            attempts=attempts,
+        )
+
+    async def set(self, target, msg_type, payload=None):
+        """Fire-and-forget: one packet, no ack, no retry (lifxlan's rapid=True). Hand it to
+        submit_and_forget rather than submit unless you check the result."""
+        message = msg_type(
+            target.mac_addr,
+            self.source_id,
+            self._next_sequence(),
+            payload or {},
+            ack_requested=False,
+            response_requested=False,
+        )
+        self._send(message.packed_message, target)
+
+    async def set_all(self, targets, msg_type, payload=None):
+        """set() to each of targets: one packet apiece, all sent in a single pass of the loop
+        rather than one device after another waiting on the last."""
+        for target in targets:
+            await self.set(target, msg_type, payload)
+
+    async def _request(
+        self, target, msg_type, payload, response_types, ack, timeout, attempts
+    ):
+        sequence = self._next_sequence()
+        key = (self.source_id, sequence)
+        future = self.loop.create_future()
+        message = msg_type(
+            target.mac_addr,
+            self.source_id,
+            sequence,
+            payload or {},
+            ack_requested=ack,
+            response_requested=not ack,
+        )
+        self._pending[key] = (future, response_types, target, message)
+        try:
+            for _ in range(attempts):
+                # Resent with the same sequence number, so a late reply to an earlier try
+                # still completes the request instead of being dropped as a stranger's.
+                self._send(message.packed_message, target)
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            self._pending.pop(key, None)
+        raise lifxlan.WorkflowException(
+            f"WorkflowException: Did not receive {[t.__name__ for t in response_types]} "
+            f"from {target.mac_addr} (Name: {getattr(target, 'label', None)}) "
+            f"in response to {msg_type.__name__}"
+        )
+
+    def _next_sequence(self) -> int:
+        """Next sequence number not already waiting on a reply. Only called on the loop."""
+        for _ in range(SEQUENCE_SPACE):
+            self._sequence = (self._sequence + 1) % SEQUENCE_SPACE
+            if (self.source_id, self._sequence) not in self._pending:
+                return self._sequence
+        raise lifxlan.WorkflowException(
+            f"WorkflowException: more than {SEQUENCE_SPACE} requests in flight"
+        )
+
+    def _send(self, packet, target):
+        self._transport.sendto(packet, (target.ip_addr, target.port))
+
+    def _dispatch(self, data, addr):
+        """Complete the request this datagram answers, if any, and show it to listeners."""
+        try:
+            message = unpack_lifx_message(data)
+        except Exception:  # pylint: disable=broad-except
+            return  # not a LIFX packet, or one too short to parse
+        entry = self._pending.get((message.source_id, message.seq_num))
+        if entry is not None:
+            future, response_types, target, request = entry
+            if (
+                not future.done()
+                and type(message) in response_types
+                and message.target_addr in (target.mac_addr, BROADCAST_MAC)
+            ):
+                # DHCP may have moved it; lifxlan tracks it the same way
+                target.ip_addr = addr[0]
+                future.set_result(message)
+                if isinstance(message, Acknowledgement):
+                    # The ack carries no state, but it confirms the Set we sent landed
+                    self._notify(target.mac_addr, request, acked=True)
+                    return
+        if not isinstance(message, Acknowledgement):
+            self._notify(message.target_addr, message, acked=False)
+
+    def add_listener(self, callback):
+        """Call callback(mac_addr, message, acked) on the loop for every packet a device sends
+        us -- replies to anyone's requests, State* a device broadcasts because another app
+        changed it -- and for each of our own Sets once it's acknowledged. acked is True only
+        for the last: a Set overheard from another client may never have landed."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, mac_addr, message, acked):
+        for callback in list(self._listeners):
+            try:
+                callback(mac_addr, message, acked)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Transport listener failed on %s", message)
+
+    def _bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if self.listen:
+            # Devices answer a source-0 request (how other apps ask) by broadcasting to
+            # LIFX_PORT, so that's where state changes made elsewhere can be overheard. No
+            # SO_REUSEADDR here: on Windows it would let us steal unicast replies from
+            # another LIFX app on this machine. If the port's taken, just don't overhear.
+            try:
+                sock.bind(("", LIFX_PORT))
+                sock.setblocking(False)
+                return sock
+            except OSError as exc:
+                self.logger.info(
+                    "Port %d busy (%s); not listening for broadcasts", LIFX_PORT, exc
+                )
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("", self.port))
+        sock.setblocking(False)
+        return sock
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._transport, _ = self.loop.run_until_complete(
+                self.loop.create_datagram_endpoint(
+                    lambda: _LanProtocol(self), sock=self._bind()
+                )
+            )
+        except OSError as exc:
+            self._error = exc
+            self._ready.set()
+            self.loop.close()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            # Cancel whatever is still waiting, so threads blocked on submit(...).result()
+            # get a CancelledError instead of hanging on a loop that will never run again
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._transport.close()
+            self.loop.run_until_complete(asyncio.sleep(0))  # let the close land
+            self.loop.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_transport() -> LanTransport:
+    """The process-wide transport, started on first use, overhearing broadcasts if it can."""
+    global _shared  # pylint: disable=global-statement
+    with _shared_lock:
+        if _shared is None:
+            _shared = LanTransport(listen=True).start()
+        return _shared
@@ -6,11 +6,12 @@ import os
 import subprocess
 import sys
 from functools import lru_cache
-from math import log, floor
 from typing import NamedTuple, Union, Tuple, List
 
 import mss
 
+from . import colors
+
 
 class Color(NamedTuple):
     """A single color vector in HSBK color-space."""
@@ -27,66 +28,9 @@ TypeHSBK = Union[Tuple[int, int, int, int], Color]
 
 
 def hsbk_to_rgb(hsvk: TypeHSBK) -> TypeRGB:
-    """Convert Tuple in HSBK color-space to RGB space.
-    Converted from PHP https://gist.github.com/joshrp/5200913"""
-    # pylint: disable=invalid-name
-    iH, iS, iV, iK = hsvk
-    dS = (100 * iS / 65535) / 100.0  # Saturation: 0.0-1.0
-    dV = (100 * iV / 65535) / 100.0  # Lightness: 0.0-1.0
-    dC = dV * dS  # Chroma: 0.0-1.0
-    dH = (360 * iH / 65535) / 60.0  # H-prime: 0.0-6.0
-    dT = dH  # Temp variable
-
-    while dT >= 2.0:  # php modulus does not work with float
-        dT -= 2.0
-    dX = dC * (1 - abs(dT - 1))
-
-    dHf = floor(dH)
-    if dHf == 0:
-        dR = dC
-        dG = dX
-        dB = 0.0
-    elif dHf == 1:
-        dR = dX
-        dG = dC
-        dB = 0.0
-    elif dHf == 2:
-        dR = 0.0
-        dG = dC
-        dB = dX
-    elif dHf == 3:
-        dR = 0.0
-        dG = dX
-        dB = dC
-    elif dHf == 4:
-        dR = dX
-        dG = 0.0
-        dB = dC
-    elif dHf == 5:
-        dR = dC
-        dG = 0.0
-        dB = dX
-    else:
-        dR = 0.0
-        dG = 0.0
-        dB = 0.0
-
-    dM = dV - dC
-    dR += dM
-    dG += dM
-    dB += dM
-
-    # Finally, factor in Kelvin
-    # Adopted from:
-    # https://github.com/tort32/LightServer/blob/master/src/main/java/com/github/tort32/api/nodemcu/protocol/RawColor.java#L125
-    rgb_hsb = int(dR * 255), int(dG * 255), int(dB * 255)
-    rgb_k = kelvin_to_rgb(iK)
-    a = iS / 65535.0
-    b = (1.0 - a) / 255
-    x = int(rgb_hsb[0] * (a + rgb_k[0] * b))
-    y = int(rgb_hsb[1] * (a + rgb_k[1] * b))
-    z = int(rgb_hsb[2] * (a + rgb_k[2] * b))
-    return x, y, z
+    """Convert Tuple in HSBK color-space to RGB space; see colors.hsbk_to_rgb_array for
+    many at once."""
+    return colors.hsbk_to_rgb(hsvk)
 
 
 def hsv_to_rgb(h: float, s: float = 1, v: float = 1) -> TypeRGB:
@@ -96,32 +40,7 @@ def hsv_to_rgb(h: float, s: float = 1, v: float = 1) -> TypeRGB:
 
 def kelvin_to_rgb(temperature: int) -> TypeRGB:
     """Convert a Kelvin (K) color-temperature to an RGB value for display."""
-    # pylint: disable=invalid-name
-    temperature /= 100
-    if temperature <= 66:
-        red = 255
-        green = temperature
-        green = 99.4708025861 * log(green + 0.0000000001) - 161.1195681661
-    else:
-        red = temperature - 60
-        red = 329.698727466 * (red**-0.1332047592)
-        red = max(red, 0)
-        red = min(red, 255)
-        green = temperature - 60
-        green = 288.1221695283 * (green**-0.0755148492)
-    green = max(green, 0)
-    green = min(green, 255)
-    # calc blue
-    if temperature >= 66:
-        blue = 255
-    elif temperature <= 19:
-        blue = 0
-    else:
-        blue = temperature - 10
-        blue = 138.5177312231 * log(blue) - 305.0447927307
-        blue = max(blue, 0)
-        blue = min(blue, 255)
-    return int(red), int(green), int(blue)
+    return colors.kelvin_to_rgb(temperature)
 
 
 def tuple2hex(tuple_: TypeRGB) -> str:
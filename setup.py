@@ -24,6 +24,7 @@ setup(
         "lifxlan",
         "bitstring<4",
         "mss",
+        "numpy",
         "pystray",
         "pywin32",
     ],